@@ -0,0 +1,220 @@
+#Headless batch radar renderer.
+#Renders every job in a CSV/JSON job list across a process pool, using the same feature store,
+#scoring and radar templates as the app. Each PNG is written as soon as it's done and recorded in
+#progress.jsonl, so an interrupted run picks up where it stopped.
+#
+#Job columns: player1, season1, squad1, player2, season2, squad2 and optionally category
+#(one of the radar categories, or blank/"all" for all four). A player2 of "League Average" with a
+#league as squad2 compares player 1 with the average of their position group in that league and season.
+#
+#    python batch.py jobs.csv --out radars_out --workers 8
+#    python batch.py --squad Arsenal --season 23/24 --out arsenal_2324
+#    python batch.py --squad Arsenal --season 23/24 --benchmark --out arsenal_2324
+import argparse
+import itertools
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from features import STORE_DIR, current_manifest, load_feature_store
+from scoring import job_columns
+
+#player2 name standing for the league-position benchmark
+BENCHMARK = "League Average"
+
+#Per worker state, filled in by init_worker
+worker = {}
+
+
+def init_worker(store_dir = STORE_DIR):
+    #Every worker draws off screen with its own Agg backend and its own copy of the templates
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from badges import BadgeAtlas
+    from cache import LRUCache
+    from lookup import PlayerIndex
+
+    data_version, df_clean = load_feature_store(store_dir)
+    worker["data_version"] = data_version
+    worker["df_clean"] = df_clean
+    worker["player_index"] = PlayerIndex(df_clean)
+    worker["badge_atlas"] = BadgeAtlas()
+    worker["score_cache"] = LRUCache(max_entries = 64, max_bytes = 512 * 2**20)
+
+
+def slug(text):
+    return re.sub(r"[^\w\-]+", "_", str(text)).strip("_")
+
+
+def output_path(out_dir, job):
+    #Players are only unique per (player, season, squad), like everywhere else in the pipeline
+    name = f"{slug(job['player1'])}_{slug(job['season1'])}_{slug(job['squad1'])}__{slug(job['player2'])}_{slug(job['season2'])}_{slug(job['squad2'])}.png"
+    return os.path.join(out_dir, job["category"], name)
+
+
+#Expands blank/"all" categories and validates the job list
+def expand_jobs(jobs):
+    from scoring import categories
+
+    expanded = []
+    for job in jobs:
+        missing = [column for column in job_columns if pd.isna(job.get(column)) or job.get(column) == ""]
+        if missing:
+            raise ValueError(f"Job {job} is missing {', '.join(missing)}")
+
+        category = job.get("category")
+        names = list(categories) if category in (None, "", "all") or pd.isna(category) else [category]
+        for name in names:
+            if name not in categories:
+                raise ValueError(f"Unknown radar category {name!r}, expected one of {', '.join(categories)}")
+            expanded.append({**{column: str(job[column]) for column in job_columns}, "category": name})
+
+    return expanded
+
+
+def read_jobs(path):
+    if path.endswith(".json"):
+        with open(path) as f:
+            jobs = json.load(f)
+    else:
+        jobs = pd.read_csv(path, dtype = str).to_dict("records")
+    return expand_jobs(jobs)
+
+
+def squad_players(player_index, squad, season):
+    players = player_index.player_options(squad, season)
+    if not players:
+        raise ValueError(f"No players found for {squad} in {season}")
+    return players
+
+
+#Every pair of different players in a squad season, once each unless both orders are asked for
+def squad_pair_jobs(player_index, squad, season, category = "all", ordered = False):
+    pairs = itertools.permutations if ordered else itertools.combinations
+    jobs = [{"player1": p1, "season1": season, "squad1": squad, "player2": p2, "season2": season, "squad2": squad, "category": category}
+            for p1, p2 in pairs(squad_players(player_index, squad, season), 2)]
+    return expand_jobs(jobs)
+
+
+#Every player in a squad season against the average of their position group in their league
+def benchmark_jobs(player_index, squad, season, category = "all"):
+    jobs = [{"player1": player, "season1": season, "squad1": squad, "player2": BENCHMARK, "season2": season, "squad2": player_index.row(player, season, squad)["Comp"], "category": category}
+            for player in squad_players(player_index, squad, season)]
+    return expand_jobs(jobs)
+
+
+def render_job(job, out_dir):
+    from render import benchmark_args, comparison_args, render_png
+    from scoring import categories, position_groups, score_pool
+
+    player_index = worker["player_index"]
+    is_benchmark = job["player2"] == BENCHMARK
+    keys = [(job["player1"], job["season1"], job["squad1"])]
+    if not is_benchmark:
+        keys.append((job["player2"], job["season2"], job["squad2"]))
+    for key in keys:
+        if key not in player_index:
+            raise KeyError(f"No player-season {key} in the feature store")
+    rows = [player_index.row(*key) for key in keys]
+
+    category = categories[job["category"]]
+    pool_groups = position_groups([row["Pos"] for row in rows])
+    category_key = (pool_groups, job["category"])
+    category_scores = worker["score_cache"].get_or_compute(category_key, lambda: score_pool(worker["df_clean"], pool_groups, [job["category"]])[job["category"]])
+
+    if is_benchmark:
+        radar_args = benchmark_args(category_scores, category, rows[0], keys[0], job["squad2"], job["season2"], worker["badge_atlas"])
+    else:
+        radar_args = comparison_args(category_scores, category, rows, keys, worker["badge_atlas"])
+    png = render_png(category, *radar_args)
+
+    path = output_path(out_dir, job)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+
+    return path, worker["data_version"]
+
+
+#Paths already finished by an earlier run of the same job list, with the data version each was drawn from
+def completed_paths(progress_path):
+    if not os.path.exists(progress_path):
+        return {}
+
+    done = {}
+    with open(progress_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done[record["path"]] = record.get("data_version")
+    return done
+
+
+def run_batch(jobs, out_dir, workers = None, resume = True, store_dir = STORE_DIR):
+    #Read once up front; the workers load the same artifact
+    data_version = current_manifest(store_dir)["version"]
+    os.makedirs(out_dir, exist_ok = True)
+    progress_path = os.path.join(out_dir, "progress.jsonl")
+
+    #Radars drawn from an older version of the data are redone
+    done = completed_paths(progress_path) if resume else {}
+    pending = [job for job in jobs if not (done.get(output_path(out_dir, job)) == data_version and os.path.exists(output_path(out_dir, job)))]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending)} already rendered, {len(pending)} to go")
+
+    failures = 0
+    with open(progress_path, "a") as progress, ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (store_dir,)) as executor:
+        futures = {executor.submit(render_job, job, out_dir): job for job in pending}
+        for finished, future in enumerate(as_completed(futures), start = 1):
+            job = futures[future]
+            try:
+                path, data_version = future.result()
+                record = {"status": "ok", "path": path, "data_version": data_version, **job}
+            except Exception as e:
+                failures += 1
+                record = {"status": "error", "path": output_path(out_dir, job), "error": f"{type(e).__name__}: {e}", **job}
+
+            progress.write(json.dumps(record) + "\n")
+            progress.flush()
+            if finished % 50 == 0 or finished == len(pending):
+                print(f"{finished}/{len(pending)} rendered, {failures} failed")
+
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Render radar comparisons in bulk.")
+    parser.add_argument("jobs", nargs = "?", help = "CSV or JSON job list")
+    parser.add_argument("--squad", help = "render every player pair in this squad instead of a job list")
+    parser.add_argument("--season", help = "season for --squad, e.g. 23/24")
+    parser.add_argument("--category", default = "all", help = "category for --squad jobs (default: all)")
+    parser.add_argument("--ordered", action = "store_true", help = "render each --squad pair both ways round")
+    parser.add_argument("--benchmark", action = "store_true", help = "render each --squad player against their league-position average instead of pairs")
+    parser.add_argument("--out", default = "radars_out", help = "output directory")
+    parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "worker processes (default: all cores)")
+    parser.add_argument("--no-resume", action = "store_true", help = "re-render jobs already recorded as done")
+    args = parser.parse_args()
+
+    if args.squad:
+        if not args.season:
+            parser.error("--squad needs --season")
+        init_worker()
+        if args.benchmark:
+            jobs = benchmark_jobs(worker["player_index"], args.squad, args.season, args.category)
+        else:
+            jobs = squad_pair_jobs(worker["player_index"], args.squad, args.season, args.category, ordered = args.ordered)
+    elif args.jobs:
+        jobs = read_jobs(args.jobs)
+    else:
+        parser.error("give a job list or --squad/--season")
+
+    failures = run_batch(jobs, args.out, workers = args.workers, resume = not args.no_resume)
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,143 @@
+#Headless benchmark of each stage of the radar pipeline on synthetic data of increasing size.
+#Untraced times and, from a separate traced run, peak memory per stage are written as JSON so runs
+#can be compared across commits.
+#
+#    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output bench_results.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from badges import BadgeAtlas
+from features import merge_team_possession, read_player_csv, read_team_csv, transform_metrics
+from lookup import PlayerIndex
+from render import PREVIEW_DPI, encode_png, get_template, release_templates, comparison_args
+from scoring import categories, position_groups, score_pool
+from synthetic_data import write_synthetic_csvs
+
+
+#Peak memory traced while fn runs. Tracing slows allocation heavy stages several fold, so this is
+#a separate run from the timed ones.
+def traced_peak_mb(fn, setup = None):
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak/2**20
+
+
+#Best of `repeat` untraced runs for each stage, keeping the result of the last run, plus the peak
+#memory of one more traced run. setup runs before every run, outside the timing.
+def best_of(fn, repeat, setup = None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, {"seconds": min(times), "peak_mb": traced_peak_mb(fn, setup)}
+
+
+#A single timed run and its traced peak memory
+def measure(fn, setup = None):
+    return best_of(fn, 1, setup)
+
+
+def benchmark_size(n_players, data_dir, repeat = 3, lookups = 1000):
+    player_path, team_path = write_synthetic_csvs(data_dir, n_players)
+    stages = {}
+
+    (player_df, team_df), stages["csv_load"] = best_of(lambda: (read_player_csv(player_path), read_team_csv(team_path)), repeat)
+    merged, stages["merge_clean"] = best_of(lambda: merge_team_possession(player_df, team_df), repeat)
+    df_clean, stages["per_90_poss_adj"] = best_of(lambda: transform_metrics(merged.copy()), repeat)
+
+    #Scoring the two most common positions as one pool, like a typical comparison
+    top_positions = df_clean["Pos"].value_counts().index[:2].tolist()
+    pool_groups = position_groups(top_positions)
+    pool_scores = {}
+    for name in categories:
+        pool_scores[name], stages[f"score_{name.lower()}"] = best_of(lambda: score_pool(df_clean, pool_groups, [name])[name], repeat)
+    _, stages["score_all_categories"] = best_of(lambda: score_pool(df_clean, pool_groups), repeat)
+
+    player_index, stages["index_build"] = best_of(lambda: PlayerIndex(df_clean), repeat)
+    in_pool = pool_scores["Creating"]["df"]
+    keys = list(zip(in_pool["Player"], in_pool["Season"], in_pool["Squad"]))
+    sample = [keys[i] for i in np.random.default_rng(0).integers(0, len(keys), lookups)]
+    _, stages[f"player_lookup_x{lookups}"] = best_of(lambda: [player_index.row(*key) for key in sample], repeat)
+
+    category = categories["Creating"]
+    badge_atlas = BadgeAtlas()
+    player_keys = sample[:2]
+    rows = [player_index.row(*key) for key in player_keys]
+    radar_args = comparison_args(pool_scores["Creating"], category, rows, player_keys, badge_atlas)
+
+    _, stages["template_build"] = measure(lambda: get_template(category), setup = release_templates)
+    fig, stages["figure_update"] = best_of(lambda: get_template(category).update(*radar_args), repeat)
+    png, stages["png_encode"] = best_of(lambda: encode_png(fig), repeat)
+    _, stages["png_encode_preview"] = best_of(lambda: encode_png(fig, dpi = PREVIEW_DPI), repeat)
+    release_templates()
+
+    return {"rows": n_players, "clean_rows": len(df_clean), "pool_rows": len(in_pool), "png_bytes": len(png), "stages": stages}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd = REPO_DIR, capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the radar pipeline on synthetic data.")
+    parser.add_argument("--sizes", default = "1000,10000,100000", help = "comma separated player-season row counts")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per stage, the fastest is kept")
+    parser.add_argument("--output", default = "bench_results.json", help = "JSON results file")
+    args = parser.parse_args()
+
+    #Badges are looked up relative to the repo root
+    os.chdir(REPO_DIR)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            run = benchmark_size(size, data_dir, repeat = args.repeat)
+            results["runs"].append(run)
+
+            print(f"\n{size} rows ({run['clean_rows']} over 450 mins, {run['pool_rows']} in pool)")
+            for stage, stats in run["stages"].items():
+                print(f"  {stage:<24}{stats['seconds']*1000:>10.1f} ms{stats['peak_mb']:>10.1f} MB")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent = 2)
+    print(f"\nResults written to {args.output}")
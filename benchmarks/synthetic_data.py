@@ -0,0 +1,120 @@
+#Synthetic player and team CSVs with the real column schema, for benchmarking at any size.
+#Team columns and value ranges are taken from Top5TeamData202025.csv; player files get the same
+#stat columns plus the player id columns, with counting stats scaled by minutes played.
+#
+#    python benchmarks/synthetic_data.py --players 100000 --out bench_data
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEAM_TEMPLATE = os.path.join(REPO_DIR, "Top5TeamData202025.csv")
+
+leagues = ["Premier League", "La Liga", "Serie A", "Bundesliga", "Ligue 1"]
+teams_per_league = 20
+first_season_end = 2020
+
+player_id_columns = ["Season_End_Year", "Squad", "Comp", "Player", "Nation", "Pos", "Age", "Born"]
+positions = ["GK", "DF", "DF", "DF,MF", "MF", "MF", "MF,FW", "MF,DF", "FW", "FW", "FW,MF"]
+
+#Team level columns that have no player equivalent
+team_only_columns = ["Team_or_Opponent", "Num_Players", "Poss", "Url"]
+
+#Differences that are centred on zero rather than counts
+signed_columns = ["G_minus_xG_Expected", "np:G_minus_xG_Expected", "A_minus_xAG_Expected", "G_minus_PK"]
+
+
+#Rates, percentages and averages keep the team's scale instead of being split across players
+def is_rate_column(column):
+    return "percent" in column or "per_" in column or "Per" in column or "90" in column or column in ("Dist_Standard", "Age")
+
+
+def synthetic_team_df(n_seasons, template = TEAM_TEMPLATE, seed = 0):
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv(template)
+    numeric = [column for column in real.columns if pd.api.types.is_numeric_dtype(real[column]) and column != "Season_End_Year"]
+
+    n_teams = n_seasons*len(leagues)*teams_per_league
+    seasons = np.repeat(first_season_end + np.arange(n_seasons), len(leagues)*teams_per_league)
+    comps = np.tile(np.repeat(leagues, teams_per_league), n_seasons)
+    squads = np.tile([f"{league[:3].upper()} Club {i:02d}" for league in leagues for i in range(teams_per_league)], n_seasons)
+
+    frames = []
+    for side in ["team", "opponent"]:
+        columns = {"Season_End_Year": seasons, "Squad": squads, "Comp": comps, "Team_or_Opponent": side, "Url": ""}
+        for column in numeric:
+            mean, std = real[column].mean(), real[column].std()
+            values = rng.normal(mean, std if std > 0 else 1, n_teams)
+            columns[column] = values if column in signed_columns else np.abs(values)
+        frames.append(pd.DataFrame(columns)[real.columns])
+
+    #Possession of a team and its opponents add up to 100
+    frames[1]["Poss"] = 100 - frames[0]["Poss"].clip(25, 75)
+    frames[0]["Poss"] = 100 - frames[1]["Poss"]
+    return pd.concat(frames, ignore_index = True)
+
+
+def synthetic_player_df(team_df, n_players, seed = 0):
+    rng = np.random.default_rng(seed + 1)
+    teams = team_df[team_df["Team_or_Opponent"] == "team"].reset_index(drop = True)
+    stat_columns = [column for column in teams.columns if column not in team_only_columns + player_id_columns]
+
+    #Players are spread evenly over the team seasons
+    team_rows = np.arange(n_players) % len(teams)
+    squad_stats = teams.iloc[team_rows].reset_index(drop = True)
+    players_per_team = max(1, n_players//len(teams))
+
+    player_df = pd.DataFrame({
+        "Season_End_Year": squad_stats["Season_End_Year"],
+        "Squad": squad_stats["Squad"],
+        "Comp": squad_stats["Comp"],
+        "Player": [f"Player {i // len(teams):03d} {squad}" for i, squad in enumerate(squad_stats["Squad"])],
+        "Nation": "",
+        "Pos": rng.choice(positions, n_players),
+        "Age": rng.integers(17, 37, n_players),
+        "Born": squad_stats["Season_End_Year"] - rng.integers(17, 37, n_players),
+    })
+
+    minutes = rng.integers(0, 3421, n_players)
+    minute_share = minutes/3420
+    stats = {}
+    for column in stat_columns:
+        team_values = squad_stats[column].to_numpy(dtype = np.float64)
+        noise = rng.gamma(2, 0.5, n_players)
+        if column in signed_columns:
+            stats[column] = rng.normal(0, 1.5, n_players)*minute_share
+        elif is_rate_column(column):
+            stats[column] = team_values*rng.normal(1, 0.2, n_players).clip(0.2)
+        else:
+            stats[column] = team_values/players_per_team*noise*minute_share*2
+
+    stats["Min_Playing"] = minutes
+    stats["Mins_Per_90"] = minutes/90
+    return pd.concat([player_df, pd.DataFrame(stats)], axis = 1)
+
+
+#Writes a player file of n_players rows and a team file covering enough seasons for them
+def write_synthetic_csvs(out_dir, n_players, players_per_team = 25, seed = 0):
+    n_seasons = max(1, int(np.ceil(n_players/(players_per_team*len(leagues)*teams_per_league))))
+    team_df = synthetic_team_df(n_seasons, seed = seed)
+    player_df = synthetic_player_df(team_df, n_players, seed = seed)
+
+    os.makedirs(out_dir, exist_ok = True)
+    player_path = os.path.join(out_dir, "Top5PlayerData202025.csv")
+    team_path = os.path.join(out_dir, "Top5TeamData202025.csv")
+    player_df.to_csv(player_path, index = False)
+    team_df.to_csv(team_path, index = False)
+    return player_path, team_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Write synthetic player and team CSVs.")
+    parser.add_argument("--players", type = int, default = 10000, help = "player-season rows to generate")
+    parser.add_argument("--out", default = "bench_data", help = "output directory")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    player_path, team_path = write_synthetic_csvs(args.out, args.players, seed = args.seed)
+    print(f"Wrote {player_path} and {team_path}")
@@ -0,0 +1,97 @@
+#Bounded, thread safe LRU cache with memory accounting.
+#Streamlit serves every session from threads in one process, so an instance held in
+#st.cache_resource (or at module level) is shared by all sessions.
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from profiling import record_cache
+
+
+#Rough in-memory size of a cached value in bytes
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index = True, deep = True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index = True, deep = True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    def __init__(self, max_entries = 128, max_bytes = None, sizeof = estimate_size, name = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default = None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+
+            #Values bigger than the whole budget are not worth evicting everything for
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, (_, evicted_size) = self._entries.popitem(last = False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    #Computed outside the lock so a slow miss doesn't block other sessions' hits
+    def get_or_compute(self, key, compute):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if self.name is not None:
+            record_cache(self.name, value is not sentinel)
+        if value is sentinel:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,367 @@
+#Offline feature store: cleans, per 90s and possession adjusts the source CSVs and writes the
+#result as parquet partitions per (season, league), listed in a manifest that names the data version.
+#Run `python features.py` after new matchweeks land to rebuild only the partitions that changed.
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from scoring import categories
+
+PLAYER_CSV = "Top5PlayerData202025.csv"
+TEAM_CSV = "Top5TeamData202025.csv"
+STORE_DIR = "feature_store"
+
+MIN_MINUTES = 450
+
+#Bumped whenever the stored table's columns or dtypes change, so old artifacts aren't reused
+STORE_SCHEMA = 3
+
+vars_to_90 = ["Touches_Touches", "Def Pen_Touches", "Def 3rd_Touches", "Mid 3rd_Touches", "Att 3rd_Touches", "Att Pen_Touches", "Live_Touches", "Att_Take", "Succ_Take", "Tkld_Take", "Carries_Carries", "TotDist_Carries", "PrgDist_Carries", "PrgC_Carries", "Final_Third_Carries", "CPA_Carries", "Mis_Carries", "Dis_Carries", "Rec_Receiving", "PrgR_Receiving", "Gls_Standard", "FK_Standard", "PK_Standard", "xG_Expected", "npxG_Expected", "G_minus_xG_Expected", "np:G_minus_xG_Expected", "Att", "Live_Pass", "Dead_Pass", "FK_Pass", "TB_Pass", "Sw_Pass", "Crs_Pass", "Off_Outcomes", "Blocks_Outcomes", "Cmp_Total", "Att_Total", "TotDist_Total", "PrgDist_Total", "Cmp_Short", "Att_Short", "Cmp_Medium", "Att_Medium", "Cmp_Long", "Att_Long", "Ast", "xAG", "xA_Expected", "A_minus_xAG_Expected", "KP", "Final_Third", "PPA", "CrsPA", "PrgP", "PassLive_SCA", "PassDead_SCA", "TO_SCA", "Sh_SCA", "Fld_SCA", "Def_SCA", "Fls", "Fld", "Off", "Crs", "TklW", "PKwon", "PKcon", "OG", "Recov", "Won_Aerial", "Lost_Aerial", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_Challenges", "Att_Challenges", "Lost_Challenges", "Blocks_Blocks", "Sh_Blocks", "Pass_Blocks", "Int", "Tkl+Int", "Clr", "Err"]
+
+vars_to_padj = ["TklW", "PKcon", "Recov", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_Challenges", "Att_Challenges", "Lost_Challenges", "Blocks_Blocks", "Sh_Blocks", "Pass_Blocks", "Int", "Tkl+Int", "Clr", "Err"]
+
+#Radar metrics computed in clean_player_data rather than read from the player file
+derived_vars = ["xA_per_KP", "Att_Aerial", "Sh_per_100_Touches", "PA_Touches_per_Sh"]
+
+#Only the columns the pipeline and the radar categories use are read from the source files
+id_columns = ["Player", "Pos", "Squad", "Comp", "Season_End_Year", "Min_Playing", "Mins_Per_90"]
+derived_inputs = ["xA_Expected", "KP", "Won_Aerial", "Lost_Aerial", "Touches_Touches", "Sh_Standard", "Att Pen_Touches"]
+category_metrics = list(dict.fromkeys(var for category in categories.values() for var in category["vars"] if var not in derived_vars))
+player_columns = list(dict.fromkeys(id_columns + derived_inputs + category_metrics))
+team_columns = ["Season_End_Year", "Comp", "Squad", "Team_or_Opponent", "Poss"]
+
+#Repeated labels are stored as categoricals and metrics as float32
+categorical_columns = ["Player", "Pos", "Squad", "Comp", "Season"]
+
+
+#Function to convert to per 90
+def to_per_90(metric, mins_per_90):
+    return metric/mins_per_90
+
+
+#Function to possession adjust
+def poss_adj(metric, poss):
+    return metric*(50/poss)
+
+
+#Cheap change detector for the source files, used to key caches without re-hashing
+def source_stamp(paths = (PLAYER_CSV, TEAM_CSV)):
+    return tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+
+
+#Joining team possession onto players and filtering out players without required minutes
+def merge_team_possession(player_df, team_df):
+    team_data = team_df[team_df["Team_or_Opponent"] == "team"]
+    df = pd.merge(player_df, team_data[["Season_End_Year", "Comp", "Squad", "Poss"]], how = "left", on = ["Season_End_Year", "Comp", "Squad"])
+    return df[df["Min_Playing"] >= MIN_MINUTES].copy()
+
+
+#Derived metrics (from season totals), per 90 / possession adjusted metrics and the season label.
+#sh_max is the largest shot count across the whole table, passed in when transforming one partition.
+def transform_metrics(df_clean, sh_max = None):
+    if sh_max is None:
+        sh_max = df_clean["Sh_Standard"].max()
+    df_clean["xA_per_KP"] = np.where(df_clean["KP"] != 0, df_clean["xA_Expected"]/df_clean["KP"], 0)
+    df_clean["Att_Aerial"] = df_clean["Won_Aerial"] + df_clean["Lost_Aerial"]
+    df_clean["Sh_per_100_Touches"] = np.where(df_clean["Touches_Touches"] != 0, 100*df_clean["Sh_Standard"]/df_clean["Touches_Touches"], 0)
+    df_clean["PA_Touches_per_Sh"] = np.where(df_clean["Sh_Standard"] != 0, df_clean["Att Pen_Touches"]/df_clean["Sh_Standard"], df_clean["Att Pen_Touches"]/(sh_max + 1))
+
+    #Per 90 and possession adjusting whichever of the metrics were loaded
+    loaded_to_90 = [var for var in vars_to_90 if var in df_clean]
+    loaded_to_padj = [var for var in vars_to_padj if var in df_clean]
+    df_clean[loaded_to_90] = df_clean[loaded_to_90].apply(to_per_90, axis = 0, mins_per_90 = df_clean["Mins_Per_90"])
+    df_clean[loaded_to_padj] = df_clean[loaded_to_padj].apply(poss_adj, axis = 0, poss = df_clean["Poss"])
+    df_clean["Season_Start_Year"] = df_clean["Season_End_Year"] - 1
+    df_clean["Season"] = df_clean["Season_Start_Year"].astype(str).str[2:] + "/" + df_clean["Season_End_Year"].astype(str).str[2:]
+
+    return shrink_dtypes(df_clean.reset_index(drop = True))
+
+
+#Data cleaning and transformation
+def clean_player_data(player_df, team_df):
+    return transform_metrics(merge_team_possession(player_df, team_df))
+
+
+#Categoricals for repeated labels, float32 metrics and small ints for years.
+#The cleaning itself runs in float64; only the stored result is downcast.
+def shrink_dtypes(df_clean):
+    for column in df_clean.columns:
+        if column in categorical_columns:
+            df_clean[column] = df_clean[column].astype("category")
+        elif column in ("Season_End_Year", "Season_Start_Year"):
+            df_clean[column] = df_clean[column].astype(np.int16)
+        elif pd.api.types.is_numeric_dtype(df_clean[column]):
+            df_clean[column] = df_clean[column].astype(np.float32)
+    return df_clean
+
+
+def read_player_csv(path = PLAYER_CSV):
+    return pd.read_csv(path, usecols = player_columns)
+
+
+def read_team_csv(path = TEAM_CSV):
+    return pd.read_csv(path, usecols = team_columns)
+
+
+#Partitions are stored one parquet file per (season, league) and named by their content hash
+def partition_key(season_end_year, comp):
+    return f"{int(season_end_year)}|{comp}"
+
+
+def partition_path(season_end_year, comp, part_hash, store_dir = STORE_DIR):
+    return os.path.join(store_dir, "partitions", f"season={int(season_end_year)}", f"comp={comp}", f"part-{part_hash}.parquet")
+
+
+def manifest_path(store_dir = STORE_DIR):
+    return os.path.join(store_dir, "manifest.json")
+
+
+#Hash of a partition's merged (pre transform) rows, so a partition is only rebuilt when its
+#player rows or its teams' possession change
+def partition_hash(merged_part):
+    digest = hashlib.sha256(f"schema {STORE_SCHEMA}".encode())
+    digest.update(",".join(merged_part.columns).encode())
+    digest.update(pd.util.hash_pandas_object(merged_part, index = False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+#The data version covers every partition and the cross partition shot maximum
+def manifest_version(partitions, sh_max):
+    digest = hashlib.sha256(f"schema {STORE_SCHEMA} sh_max {sh_max!r}".encode())
+    for key in sorted(partitions):
+        digest.update(f"{key}={partitions[key]['hash']};".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_manifest(store_dir = STORE_DIR):
+    try:
+        with open(manifest_path(store_dir)) as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("schema") == STORE_SCHEMA else None
+
+
+def write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, value):
+    with open(path, "w") as f:
+        json.dump(value, f, indent = 1)
+
+
+#Only one ingest runs at a time per store; others wait and then find nothing left to do
+@contextmanager
+def ingest_lock(store_dir = STORE_DIR):
+    os.makedirs(store_dir, exist_ok = True)
+    with open(os.path.join(store_dir, ".ingest.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+#Partition files dropped from the manifest, with the time each was replaced. They are kept for
+#grace_seconds after that, so readers still holding the previous manifest can finish loading.
+def retire_partitions(previous, partitions, now):
+    live = {part["path"] for part in partitions.values()}
+    retired = {} if previous is None else dict(previous.get("retired", {}))
+    if previous is not None:
+        for part in previous["partitions"].values():
+            retired.setdefault(part["path"], now)
+    return {path: retired_at for path, retired_at in retired.items() if path not in live}
+
+
+#Deletes retired files past the grace period, plus files no manifest knows about (e.g. left by an
+#interrupted ingest) once they are that old too
+def remove_stale_partitions(manifest, expired, store_dir = STORE_DIR, grace_seconds = 600):
+    for path in expired:
+        if os.path.exists(path):
+            os.remove(path)
+
+    known = {os.path.normpath(path) for path in manifest["retired"]}
+    known.update(os.path.normpath(part["path"]) for part in manifest["partitions"].values())
+    now = time.time()
+    for root, _, names in os.walk(os.path.join(store_dir, "partitions")):
+        for name in names:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in known and now - os.path.getmtime(path) > grace_seconds:
+                os.remove(path)
+
+
+#Incremental refresh: the CSVs are merged once, split into (season, league) partitions and only
+#partitions whose hash changed are transformed and rewritten. The manifest is swapped in last,
+#so readers see either the old or the new version, never a mix.
+#Without explicit CSVs, the ones the store was last ingested from are used (PLAYER_CSV and
+#TEAM_CSV for a new store), so a plain refresh never undoes an ingest of other files.
+def build_feature_store(force = False, player_csv = None, team_csv = None, store_dir = STORE_DIR, grace_seconds = 600):
+    with ingest_lock(store_dir):
+        previous = read_manifest(store_dir)
+        source_paths = previous.get("source_paths", [PLAYER_CSV, TEAM_CSV]) if previous is not None else [PLAYER_CSV, TEAM_CSV]
+        explicit = player_csv is not None or team_csv is not None
+        player_csv = player_csv if player_csv is not None else source_paths[0]
+        team_csv = team_csv if team_csv is not None else source_paths[1]
+        try:
+            sources = source_stamp((player_csv, team_csv))
+        except OSError:
+            #Files an earlier ingest came from may have been moved away; the store stays as published
+            if previous is None or explicit:
+                raise
+            return previous["version"], []
+        if not force and previous is not None and previous.get("source_paths") == [player_csv, team_csv] and previous["sources"] == [list(stamp) for stamp in sources]:
+            return previous["version"], []
+
+        merged = merge_team_possession(read_player_csv(player_csv), read_team_csv(team_csv))
+
+        #PA_Touches_per_Sh for players without a shot depends on the largest shot count in the
+        #whole table; when that moves, partitions holding such players have to be redone too
+        sh_max = float(merged["Sh_Standard"].max())
+        sh_max_changed = previous is None or previous["sh_max"] != sh_max
+        old_partitions = {} if previous is None or force else previous["partitions"]
+
+        partitions = {}
+        changed = []
+        for (season_end_year, comp), part in merged.groupby(["Season_End_Year", "Comp"], sort = True):
+            key = partition_key(season_end_year, comp)
+            part_hash = partition_hash(part)
+            old = old_partitions.get(key)
+            stale = old is None or old["hash"] != part_hash or not os.path.exists(old["path"])
+            if not stale and sh_max_changed and (part["Sh_Standard"] == 0).any():
+                stale = True
+
+            if stale:
+                path = partition_path(season_end_year, comp, part_hash, store_dir)
+                df_part = transform_metrics(part.copy(), sh_max = sh_max)
+                write_atomic(path, lambda tmp_path: df_part.to_parquet(tmp_path, index = False))
+                partitions[key] = {"hash": part_hash, "path": path, "rows": len(df_part)}
+                changed.append(key)
+            else:
+                partitions[key] = old
+
+        now = time.time()
+        retired = retire_partitions(previous, partitions, now)
+        expired = [path for path, retired_at in retired.items() if now - retired_at > grace_seconds]
+
+        manifest = {
+            "schema": STORE_SCHEMA,
+            "version": manifest_version(partitions, sh_max),
+            "source_paths": [player_csv, team_csv],
+            "sources": [list(stamp) for stamp in sources],
+            "sh_max": sh_max,
+            "partitions": partitions,
+            "retired": {path: retired_at for path, retired_at in retired.items() if path not in expired},
+        }
+        write_atomic(manifest_path(store_dir), lambda tmp_path: write_json(tmp_path, manifest))
+        remove_stale_partitions(manifest, expired, store_dir, grace_seconds)
+
+    return manifest["version"], changed
+
+
+#Concatenating the partitions of one manifest. Categoricals are rebuilt afterwards since
+#each partition file carries its own category set.
+def read_partitions(manifest):
+    frames = [pd.read_parquet(part["path"]) for part in manifest["partitions"].values()]
+    #Back into the source files' season then squad order, which the sidebar options follow
+    df_clean = pd.concat(frames, ignore_index = True)
+    df_clean = df_clean.sort_values(["Season_End_Year", "Squad"], kind = "stable", ignore_index = True)
+    for column in categorical_columns:
+        df_clean[column] = df_clean[column].astype(str).astype("category")
+    return df_clean
+
+
+#The published manifest. Ingesting is left to `python features.py`, so a reader never picks up a
+#CSV that is still being written; readers only build the store when there is none yet.
+def current_manifest(store_dir = STORE_DIR):
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        build_feature_store(store_dir = store_dir)
+        manifest = read_manifest(store_dir)
+    return manifest
+
+
+#(data version, frame) of the current version
+def load_feature_store(store_dir = STORE_DIR):
+    manifest = current_manifest(store_dir)
+    return manifest["version"], read_partitions(manifest)
+
+
+#Keeps a loaded copy of the current version and polls the manifest in the background. A new version is loaded off the request path and swapped in with one assignment,
+#so readers never wait on a reload and never see half of one version and half of another.
+class FeatureStoreWatcher:
+    def __init__(self, store_dir = STORE_DIR, interval = 5.0):
+        self.store_dir = store_dir
+        self.interval = interval
+        self.loaded = load_feature_store(store_dir)
+        self.stamp = self.manifest_stamp()
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target = self.run, name = "feature-store-watcher", daemon = True)
+
+    def manifest_stamp(self):
+        try:
+            stat = os.stat(manifest_path(self.store_dir))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    #(data version, frame) of the newest fully loaded version
+    def current(self):
+        return self.loaded
+
+    def poll(self):
+        stamp = self.manifest_stamp()
+        if stamp == self.stamp:
+            return False
+        manifest = read_manifest(self.store_dir)
+        if manifest is None:
+            return False
+
+        swapped = manifest["version"] != self.loaded[0]
+        if swapped:
+            self.loaded = (manifest["version"], read_partitions(manifest))
+
+        #Only recorded once the version is in place, so a failed read is retried on the next poll
+        self.stamp = stamp
+        return swapped
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                self.error = None
+            except Exception as e:
+                #Keep serving the last good version; the next poll retries
+                self.error = e
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build or incrementally refresh the cleaned player feature store.")
+    parser.add_argument("--force", action = "store_true", help = "rebuild every partition even if it is up to date")
+    parser.add_argument("--players", help = "player CSV to ingest (default: the one last ingested)")
+    parser.add_argument("--teams", help = "team CSV to ingest (default: the one last ingested)")
+    args = parser.parse_args()
+
+    version, changed = build_feature_store(force = args.force, player_csv = args.players, team_csv = args.teams)
+    print(f"Feature store {version}: {len(changed)} partition(s) rebuilt")
+    for key in changed:
+        print(f"  {key}")
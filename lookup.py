@@ -0,0 +1,38 @@
+#Prebuilt player lookups so a rerun never scans the whole table with boolean masks
+
+
+#(Player, Season, Squad) -> row position, keeping the first row when a key repeats
+def row_index(df):
+    rows = {}
+    for i, key in enumerate(zip(df["Player"], df["Season"], df["Squad"])):
+        rows.setdefault(key, i)
+    return rows
+
+
+class PlayerIndex:
+    def __init__(self, df_clean):
+        self.df = df_clean
+        self.rows = row_index(df_clean)
+
+        #squad -> season -> players, in order of first appearance like Series.unique()
+        self.squads = {}
+        for player, season, squad in self.rows:
+            self.squads.setdefault(squad, {}).setdefault(season, []).append(player)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def squad_options(self):
+        return list(self.squads)
+
+    def season_options(self, squad):
+        return list(self.squads.get(squad, {}))
+
+    def player_options(self, squad, season):
+        return self.squads.get(squad, {}).get(season, [])
+
+    def position(self, player, season, squad):
+        return self.rows[(player, season, squad)]
+
+    def row(self, player, season, squad):
+        return self.df.iloc[self.rows[(player, season, squad)]]
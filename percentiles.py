@@ -0,0 +1,41 @@
+#Percentile ranks against a player's position group and season.
+#Sorted value arrays are built once per data version; a lookup is a binary search.
+#Metrics that count against the category score (e.g. shot distance) rank lower values higher.
+import numpy as np
+
+from scoring import categories, lower_is_better
+
+
+class PercentileIndex:
+    #Position groups use the same prefix rule as the radar score pools
+    def __init__(self, df_clean, metrics = None):
+        if metrics is None:
+            metrics = list(dict.fromkeys(var for category in categories.values() for var in category["vars"]))
+        self.metrics = metrics
+
+        #(position group, season, metric) -> sorted values, NaNs dropped
+        self.sorted_values = {}
+        positions = df_clean["Pos"].astype(str)
+        seasons = df_clean["Season"].to_numpy()
+        values = df_clean[metrics].to_numpy(dtype = np.float64)
+
+        for group in positions.unique():
+            in_group = positions.str.startswith(group).to_numpy()
+            for season in np.unique(seasons[in_group]):
+                pool = values[in_group & (seasons == season)]
+                for j, metric in enumerate(metrics):
+                    column = pool[:, j]
+                    self.sorted_values[(group, season, metric)] = np.sort(column[~np.isnan(column)])
+
+    #Share of the pool (0-100) the value is at least as good as
+    def percentile(self, group, season, metric, value):
+        pool = self.sorted_values.get((group, season, metric))
+        if pool is None or len(pool) == 0 or np.isnan(value):
+            return np.nan
+        if metric in lower_is_better:
+            return 100*(len(pool) - np.searchsorted(pool, value, side = "left"))/len(pool)
+        return 100*np.searchsorted(pool, value, side = "right")/len(pool)
+
+    #Percentiles of a player's row (from the feature store) on every axis of a category
+    def player_percentiles(self, row, category):
+        return [self.percentile(row["Pos"], row["Season"], var, row[var]) for var in category["vars"]]
@@ -0,0 +1,120 @@
+#Speculative background work: after a foreground render, the comparisons a user is likely to ask
+#for next are scored and drawn into the shared caches by a small thread pool.
+#Background tasks wait while any foreground rerun is in progress (and briefly after), check in
+#between steps, and are dropped as soon as the session that asked for them schedules something newer.
+#Drawing stays on the thread: processes started from the Streamlit script would re-run it as their
+#__main__, and Streamlit swaps __main__ at every rerun, so nothing can hide it from them safely.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from render import PREVIEW_DPI, comparison_args, render_png
+from scoring import categories, position_groups, score_pool
+
+
+class Prefetcher:
+    def __init__(self, workers = 1, max_pending = 32, quiet_period = 0.5, foreground_timeout = 10.0):
+        self.executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "radar-prefetch")
+        self.max_pending = max_pending
+
+        #Background work starts once no rerun has finished for quiet_period seconds, so quick
+        #successive clicks never overlap with it. Reruns that never reach end() (interrupted by a
+        #newer rerun) stop counting after foreground_timeout.
+        self.quiet_period = quiet_period
+        self.foreground_timeout = foreground_timeout
+
+        self.running = {}
+        self.last_end = 0.0
+        self.batches = {}
+        self.pending = 0
+        self._idle = threading.Condition()
+        self.counts = {"submitted": 0, "completed": 0, "cancelled": 0, "dropped": 0, "failed": 0}
+
+    #Foreground reruns are bracketed by begin/end with any token unique to the rerun
+    def begin(self, token):
+        with self._idle:
+            self.running[id(token)] = time.monotonic()
+
+    def end(self, token):
+        with self._idle:
+            self.running.pop(id(token), None)
+            self.last_end = time.monotonic()
+            self._idle.notify_all()
+
+    #Called with the lock held
+    def foreground_busy(self):
+        now = time.monotonic()
+        self.running = {token: started for token, started in self.running.items() if now - started < self.foreground_timeout}
+        return bool(self.running) or now - self.last_end < self.quiet_period
+
+    #Waits out foreground reruns, then says whether the task's batch has been cancelled
+    def checkpoint(self, stop):
+        with self._idle:
+            while self.foreground_busy() and not stop.is_set():
+                self._idle.wait(0.1)
+        return stop.is_set()
+
+    #Replaces the owner's (e.g. a session's) unfinished speculative work with new tasks.
+    #Each task is called with a function to check between steps; it returns True once the task
+    #should give up. Tasks beyond the queue bound are dropped rather than queued.
+    def schedule(self, owner, tasks):
+        with self._idle:
+            previous = self.batches.pop(owner, None)
+            if previous is not None:
+                previous["stop"].set()
+
+            room = max(0, self.max_pending - self.pending)
+            self.counts["dropped"] += max(0, len(tasks) - room)
+            tasks = tasks[:room]
+            if not tasks:
+                return
+
+            #Batches are forgotten once their last task finishes, so idle sessions hold nothing
+            batch = {"stop": threading.Event(), "remaining": len(tasks)}
+            self.batches[owner] = batch
+            for task in tasks:
+                self.pending += 1
+                self.counts["submitted"] += 1
+                self.executor.submit(self.run, owner, batch, task)
+
+    def run(self, owner, batch, task):
+        stop = batch["stop"]
+        outcome = "cancelled"
+        try:
+            if not self.checkpoint(stop):
+                task(lambda: self.checkpoint(stop))
+                outcome = "completed"
+        except Exception:
+            #Speculative work failing only means the foreground computes it itself
+            outcome = "failed"
+        finally:
+            with self._idle:
+                self.pending -= 1
+                self.counts[outcome] += 1
+                batch["remaining"] -= 1
+                if batch["remaining"] == 0 and self.batches.get(owner) is batch:
+                    del self.batches[owner]
+
+    def stats(self):
+        with self._idle:
+            return {**self.counts, "pending": self.pending}
+
+
+#A task scoring and drawing one comparison preview into the shared caches, under the same keys
+#the app uses, so the rerun that asks for it finds both already there
+def comparison_task(df_clean, data_version, score_cache, render_cache, badge_atlas, keys, rows, category_name):
+    def task(should_stop):
+        render_key = (*keys, category_name, PREVIEW_DPI, data_version)
+        if render_key in render_cache:
+            return
+
+        groups = position_groups([row["Pos"] for row in rows])
+        category_scores = score_cache.get_or_compute((groups, data_version, category_name), lambda: score_pool(df_clean, groups, [category_name])[category_name])
+        if should_stop():
+            return
+
+        category = categories[category_name]
+        radar_args = comparison_args(category_scores, category, rows, keys, badge_atlas)
+        render_cache.put(render_key, render_png(category, *radar_args, dpi = PREVIEW_DPI, template_set = "prefetch"))
+
+    return task
@@ -0,0 +1,106 @@
+#Lightweight per-rerun profiling: named timing spans, process memory and cache hit/miss events.
+#A Profiler is activated for the current thread (each Streamlit session reruns in its own thread);
+#span() and record_cache() are no-ops when none is active, so shared code can always call them.
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("radars.profile")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+current = contextvars.ContextVar("profiler", default = None)
+
+
+#Resident memory of the process in MB (Linux), or None where /proc isn't available
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")/2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.start_rss = rss_mb()
+        self.spans = {}
+        self.caches = {}
+        self._stack = []
+
+    #Nested spans are named after their parents, e.g. "render.png_encode"
+    @contextmanager
+    def span(self, name):
+        self._stack.append(name)
+        full_name = ".".join(self._stack)
+        start = time.perf_counter()
+        start_rss = rss_mb()
+        try:
+            yield
+        finally:
+            end_rss = rss_mb()
+            self._stack.pop()
+            self.spans[full_name] = {
+                "ms": round((time.perf_counter() - start)*1000, 2),
+                "rss_delta_mb": round(end_rss - start_rss, 2) if end_rss is not None and start_rss is not None else None,
+            }
+
+    def record_cache(self, name, hit):
+        counts = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+    #Times a st.cache_* loader: a hit unless the loader body called record_cache(name, False)
+    @contextmanager
+    def loader(self, name):
+        misses = self.caches.get(name, {}).get("misses", 0)
+        with self.span(name):
+            yield
+        if self.caches.get(name, {}).get("misses", 0) == misses:
+            self.record_cache(name, True)
+
+    def summary(self, **fields):
+        end_rss = rss_mb()
+        return {
+            "event": "rerun",
+            "total_ms": round((time.perf_counter() - self.started)*1000, 2),
+            "rss_mb": round(end_rss, 1) if end_rss is not None else None,
+            "rss_delta_mb": round(end_rss - self.start_rss, 2) if end_rss is not None and self.start_rss is not None else None,
+            "spans": self.spans,
+            "caches": self.caches,
+            **fields,
+        }
+
+    #One JSON line per rerun, for building per stage latency percentiles from the logs
+    def log(self, **fields):
+        summary = self.summary(**fields)
+        logger.info(json.dumps(summary, default = str))
+        return summary
+
+
+def activate(profiler):
+    current.set(profiler)
+    return profiler
+
+
+@contextmanager
+def span(name):
+    profiler = current.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name):
+        yield
+
+
+def record_cache(name, hit):
+    profiler = current.get()
+    if profiler is not None:
+        profiler.record_cache(name, hit)
@@ -1,57 +1,56 @@
 #Loading packages
+import time
 import streamlit as st
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from mplsoccer import Radar, grid
-import matplotlib.pyplot as plt
-import io
+from features import FeatureStoreWatcher
+from scoring import categories, leaderboard, lower_is_better, position_groups, score_pool
+from cache import LRUCache
+from lookup import PlayerIndex
+from render import PREVIEW_DPI, RENDER_DPI, ExportQueue, comparison_args, render_png
+from badges import BadgeAtlas
+from similarity import SimilarityIndex
+from percentiles import PercentileIndex
+from profiling import Profiler, activate, record_cache
+from prefetch import Prefetcher, comparison_task
+
+#Per rerun timing spans and cache hit/miss counts, logged as one JSON line at the end of the script
+profiler = activate(Profiler())
+
+#Speculative background work pauses while any session's rerun is running
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher()
+
+prefetcher = get_prefetcher()
+prefetcher.begin(profiler)
 
 #Loading Data
-@st.cache_data
-def get_player_df():
-    return pd.read_csv("Top5PlayerData202025.csv")
-
-@st.cache_data
-def get_team_df():
-    return pd.read_csv("Top5TeamData202025.csv")
-
-player_df =get_player_df()
-team_df = get_team_df()
-
-#Data cleaning and transformation
-team_data = team_df[team_df["Team_or_Opponent"] == "team"]
-df = pd.merge(player_df, team_data[["Season_End_Year", "Comp", "Squad", "Poss"]], how="left", on=["Season_End_Year", "Comp", "Squad"])
-
-#Function to convert to per 90
-def to_per_90(metric, mins_per_90 = df["Mins_Per_90"]):
-    return metric/mins_per_90
-
-
-#Function to possession adjust
-def poss_adj(metric, poss = df["Poss"]):
-    return metric*(50/poss)
-
-#Filtering out players without required minutes
-df_clean = df[df["Min_Playing"] >= 450]
-
-vars_to_90 = ["Touches_Touches", "Def Pen_Touches", "Def 3rd_Touches", "Mid 3rd_Touches", "Att 3rd_Touches", "Att Pen_Touches", "Live_Touches", "Att_Take", "Succ_Take", "Tkld_Take", "Carries_Carries", "TotDist_Carries", "PrgDist_Carries", "PrgC_Carries", "Final_Third_Carries", "CPA_Carries", "Mis_Carries", "Dis_Carries", "Rec_Receiving", "PrgR_Receiving", "Gls_Standard", "FK_Standard", "PK_Standard", "xG_Expected", "npxG_Expected", "G_minus_xG_Expected", "np:G_minus_xG_Expected", "Att", "Live_Pass", "Dead_Pass", "FK_Pass", "TB_Pass", "Sw_Pass", "Crs_Pass", "Off_Outcomes", "Blocks_Outcomes", "Cmp_Total", "Att_Total", "TotDist_Total", "PrgDist_Total", "Cmp_Short", "Att_Short", "Cmp_Medium", "Att_Medium", "Cmp_Long", "Att_Long", "Ast", "xAG", "xA_Expected", "A_minus_xAG_Expected", "KP", "Final_Third", "PPA", "CrsPA", "PrgP", "PassLive_SCA", "PassDead_SCA", "TO_SCA", "Sh_SCA", "Fld_SCA", "Def_SCA", "Fls", "Fld", "Off", "Crs", "TklW", "PKwon", "PKcon", "OG", "Recov", "Won_Aerial", "Lost_Aerial", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_Challenges", "Att_Challenges", "Lost_Challenges", "Blocks_Blocks", "Sh_Blocks", "Pass_Blocks", "Int", "Tkl+Int", "Clr", "Err"]
-
-vars_to_padj = ["TklW", "PKcon", "Recov", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_Challenges", "Att_Challenges", "Lost_Challenges", "Blocks_Blocks", "Sh_Blocks", "Pass_Blocks", "Int", "Tkl+Int", "Clr", "Err"]
-
-df_clean["xA_per_KP"] = np.where(df_clean["KP"] != 0, df_clean["xA_Expected"]/df_clean["KP"], 0)
-df_clean["Att_Aerial"] = df_clean["Won_Aerial"] + df_clean["Lost_Aerial"]
-df_clean["Sh_per_100_Touches"] =np.where(df_clean["Touches_Touches"] != 0, 100*df_clean["Sh_Standard"]/df_clean["Touches_Touches"], 0)
-df_clean["PA_Touches_per_Sh"] = np.where(df_clean["Sh_Standard"] != 0, df_clean["Att Pen_Touches"]/df_clean["Sh_Standard"], df_clean["Att Pen_Touches"]/(df_clean["Sh_Standard"].max() + 1))
-
-
-df_clean[vars_to_90] = df_clean[vars_to_90].apply(to_per_90, axis = 0)
-df_clean[vars_to_padj] = df_clean[vars_to_padj].apply(poss_adj, axis = 0)
-df_clean["Season_Start_Year"] = df_clean["Season_End_Year"] - 1
-df_clean["Season"] = df_clean["Season_Start_Year"].astype(str).str[2:] + "/" + df_clean["Season_End_Year"].astype(str).str[2:]
+#The cleaning pipeline runs offline in features.py; the app only reads the built partitions.
+#One watcher per server process holds the current version and polls the store's manifest in a
+#background thread, loading a new version off the request path and swapping it in whole, so a
+#refresh never stalls a rerun. Caches below are keyed by the data version.
+#st.cache_resource hands every session the same frame rather than a pickled copy, so it must be
+#treated as read-only.
+@st.cache_resource
+def get_feature_store_watcher():
+    record_cache("load_feature_store", False)
+    return FeatureStoreWatcher().start()
+
+with profiler.loader("load_feature_store"):
+    data_version, df_clean = get_feature_store_watcher().current()
+
+#Player lookups and the sidebar squad -> season -> player options, built once per data version.
+#Two versions are kept so sessions still finishing a rerun on the previous one don't rebuild it.
+@st.cache_resource(max_entries = 2)
+def get_player_index(data_version, _df_clean):
+    record_cache("player_index", False)
+    return PlayerIndex(_df_clean)
+
+with profiler.loader("player_index"):
+    player_index = get_player_index(data_version, df_clean)
 
 st.title("Player Comparison Radar Tool")
-st.markdown("""Use this tool to generate player comparison radars. Select two players and one of the four attribute groups, then click the "Download Viz" button below to save the graphic!""")
+st.markdown("""Use this tool to generate player comparison radars. Select two players and one of the four attribute groups, then click "Prepare download" below the radar and, once the full resolution graphic is ready, "Download Viz" to save it!""")
 
 
 
@@ -64,12 +63,12 @@ st.sidebar.subheader("Player 1")
 
 #Team Selection
 p1_squad_selection = st.sidebar.selectbox(label = "Squad",
-                                         options = df_clean["Squad"].unique(),
+                                         options = player_index.squad_options(),
                                          placeholder = "Select squad...",
                                          key = "P1_Squad")
 
 #getting avaliable seasons from team selection
-p1_available_seasons = df_clean["Season"].loc[df_clean["Squad"] == p1_squad_selection].unique()
+p1_available_seasons = player_index.season_options(p1_squad_selection)
 
 #Season Selection
 p1_season_selection = st.sidebar.selectbox(label = "Season",
@@ -78,7 +77,7 @@ p1_season_selection = st.sidebar.selectbox(label = "Season",
                      key = "P1_Season")
 
 #getting available players from season selection
-p1_available_players = df_clean["Player"].loc[(df_clean["Squad"] == p1_squad_selection) & (df_clean["Season"] == p1_season_selection)].unique()
+p1_available_players = player_index.player_options(p1_squad_selection, p1_season_selection)
 
 #Player Selection
 p1_name_selection = st.sidebar.selectbox(label = "Player Name",
@@ -92,12 +91,12 @@ st.sidebar.subheader("Player 2")
 
 #Team Selection
 p2_squad_selection = st.sidebar.selectbox(label = "Squad",
-                                         options = df_clean["Squad"].unique(),
+                                         options = player_index.squad_options(),
                                          placeholder = "Select squad...",
                                          key = "P2_Squad")
 
 #getting avaliable seasons from team selection
-p2_available_seasons = df_clean["Season"].loc[df_clean["Squad"] == p2_squad_selection].unique()
+p2_available_seasons = player_index.season_options(p2_squad_selection)
 
 #Season Selection
 p2_season_selection = st.sidebar.selectbox(label = "Season",
@@ -106,7 +105,7 @@ p2_season_selection = st.sidebar.selectbox(label = "Season",
                      key = "P2_Season")
 
 #getting available players from season selection
-p2_available_players = df_clean["Player"].loc[(df_clean["Squad"] == p2_squad_selection) & (df_clean["Season"] == p2_season_selection)].unique()
+p2_available_players = player_index.player_options(p2_squad_selection, p2_season_selection)
 
 #Player Selection
 p2_name_selection = st.sidebar.selectbox(label = "Player Name",
@@ -120,364 +119,234 @@ st.sidebar.header("Choose Radar Category!")
 
 #sidebar
 radar_category = st.sidebar.selectbox(label = "Category",
-                                         options = ["Creating", "Possession", "Defense", "Shooting"],
+                                         options = list(categories),
                                          placeholder = "Select category...",
                                          key = "Radar_Cat")
 
-#grabbing badges
-def get_p1_badge():
-    return plt.imread(f"ClubBadges/{p1_squad_selection}.png")
+#selected player rows
+p1_key = (p1_name_selection, p1_season_selection, p1_squad_selection)
+p2_key = (p2_name_selection, p2_season_selection, p2_squad_selection)
 
-p1_badge = get_p1_badge()
-
-def get_p2_badge():
-    return plt.imread(f"ClubBadges/{p2_squad_selection}.png")
-
-p2_badge = get_p2_badge()
+with profiler.span("player_lookup"):
+    p1_row = player_index.row(*p1_key)
+    p2_row = player_index.row(*p2_key)
 
 #player posiition
+pool_groups = position_groups([p1_row["Pos"], p2_row["Pos"]])
 
-p1_position = df_clean["Pos"].loc[(df_clean["Squad"] == p1_squad_selection) & (df_clean["Season"] == p1_season_selection) & (df_clean["Player"] == p1_name_selection)].unique()
-p2_position = df_clean["Pos"].loc[(df_clean["Squad"] == p2_squad_selection) & (df_clean["Season"] == p2_season_selection) & (df_clean["Player"] == p2_name_selection)].unique()
-
-position_filter = [p1_position[:2], p2_position[:2]]
-position_filter = [arr.item() for arr in position_filter]
+#Score tables are computed per category, only for the category being viewed, and shared by every
+#session until the data changes. Other categories are scored the first time they are selected.
+@st.cache_resource
+def get_score_cache():
+    return LRUCache(max_entries = 64, max_bytes = 512 * 2**20, name = "score_cache")
 
-df_players = df_clean[df_clean["Pos"].str.startswith(tuple(position_filter))]
+def get_category_scores(groups, category_name):
+    category_key = (groups, data_version, category_name)
+    return get_score_cache().get_or_compute(category_key, lambda: score_pool(df_clean, groups, [category_name])[category_name])
 
-#creating score dataframes
-creating_vars = ["CPA_Carries", "PPA", "Att Pen_Touches", "KP", "xA_per_KP", "SCA90_SCA", "xA_Expected", "CrsPA", "TB_Pass"]
-creating_weights = [0.11, 0.11, 0.08, 0.11, 0.11, 0.16, 0.16, 0.08, 0.08]
+category = categories[radar_category]
+with profiler.span("scoring"):
+    category_scores = get_category_scores(pool_groups, radar_category)
 
-defending_vars = ["Recov", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_percent_Challenges", "Att_Challenges", "Blocks_Blocks", "Int", "Clr", "Att_Aerial", "Won_percent_Aerial"]
-defending_weights = [0.08, 0.07, 0.07, 0.1, 0.13, 0.1, 0.08, 0.08, 0.08, 0.08, 0.13]
 
-poss_vars = ["Cmp_percent_Total", "Cmp_Total", "PrgP", "PrgDist_Total", "PrgR_Receiving", "Final_Third", "PrgC_Carries", "PrgDist_Carries", "Final_Third_Carries", "Att_Take", "Succ_percent_Take", "Touches_Touches"]
-poss_weights = [0.0825, 0.0825, 0.0825, 0.0625, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0725]
+#Club badges are decoded and downsampled once per process and shared by every session
+@st.cache_resource
+def get_badge_atlas():
+    record_cache("badge_atlas", False)
+    return BadgeAtlas().load_all()
 
-shooting_vars = ["np:G_minus_xG_Expected", "npxG_Expected", "npxG_per_Sh_Expected", "Dist_Standard", "Sh_per_90_Standard", "Sh_per_100_Touches", "PA_Touches_per_Sh"]
-shooting_weights = [0.17, 0.16, 0.145, -0.135, 0.14, 0.125, -0.125]
-
-creating_var_names = ["Carries into PA", "Passes into PA", "PA Touches", "Key Passes", "xA per KP", "SCA", "xA", "Crosses into PA", "Through Balls"]
-defending_var_names = ["Recoveries", "Def 3rd Tackles", "Mid 3rd Tackles", "Final 3rd Tackles", "Ground Duel Success", "Ground Duels", "Blocks", "interceptions", "Clearances", "Aerial Duels", "Aerial Duel Success"]
-poss_var_names = ["Pass Completion", "Passes", "Prog Passes", "Prog Pass Dist", "Prog Pass Receptions", "Passes into FT", "Prog Carries", "Prog Carry Dist", "Final Third Carries", "Take-Ons", "Take-On Success", "Touches"]
-shooting_var_names = ["npG - xG", "npxG", "npxG per Shot", "Avg. Shot Distance", "Shots per 90", "Propensity to Shoot", "PA Touches per Shot"]
-
-creating_df = df_players[["Season", "Squad", "Comp", "Player"] + creating_vars]
-defending_df = df_players[["Season", "Squad", "Comp", "Player"] + defending_vars]
-poss_df = df_players[["Season", "Squad", "Comp", "Player"] + poss_vars]
-shooting_df = df_players[["Season", "Squad", "Comp", "Player"] + shooting_vars]
-
-
-#variable standardisation (Z Scores)
-for var in creating_vars:
-    creating_df[var] =np.log(creating_df[var] + 0.1)
-    creating_df[var] = StandardScaler().fit_transform(creating_df[var].values.reshape(-1, 1))
-    
-for var in defending_vars:
-    defending_df[var] =np.log(defending_df[var] + 0.1)
-    defending_df[var] = StandardScaler().fit_transform(defending_df[var].values.reshape(-1, 1))
-    
-for var in poss_vars:
-    poss_df[var] =np.log(poss_df[var] + 0.1)
-    poss_df[var] = StandardScaler().fit_transform(poss_df[var].values.reshape(-1, 1))
-
-for var in shooting_vars:
-    if var != "np:G_minus_xG_Expected":
-        shooting_df[var] =np.log(shooting_df[var] + 0.1)
-        shooting_df[var] = StandardScaler().fit_transform(shooting_df[var].values.reshape(-1, 1))
-    else:
-        shooting_df[var] = StandardScaler().fit_transform(shooting_df[var].values.reshape(-1, 1))
-        
-
-#creating weighted averages from weights
-creating_df["Weighted_Avg"] = creating_df[creating_vars].values @ creating_weights
-defending_df["Weighted_Avg"] = defending_df[defending_vars].values @ defending_weights
-poss_df["Weighted_Avg"] = poss_df[poss_vars].values @ poss_weights
-shooting_df["Weighted_Avg"] = shooting_df[shooting_vars].values @ shooting_weights
-
-#creating scores from the weighted averages
-creating_df["Score"] = MinMaxScaler(feature_range=(0, 100)).fit_transform(creating_df[["Weighted_Avg"]])
-defending_df["Score"] = MinMaxScaler(feature_range=(0, 100)).fit_transform(defending_df[["Weighted_Avg"]])
-poss_df["Score"] = MinMaxScaler(feature_range=(0, 100)).fit_transform(poss_df[["Weighted_Avg"]])
-shooting_df["Score"] = MinMaxScaler(feature_range=(0, 100)).fit_transform(shooting_df[["Weighted_Avg"]])
+with profiler.loader("badge_atlas"):
+    badge_atlas = get_badge_atlas()
 
 
 #building the radars
+def comparison_radar_args():
+    return comparison_args(category_scores, category, [p1_row, p2_row], [p1_key, p2_key], badge_atlas)
 
-#adding upper and lower bounds
-creating_lower_bounds = []
-creating_upper_bounds = []
 
-defending_lower_bounds = []
-defending_upper_bounds = []
+#Encoded radars are shared by every session, so a repeated comparison is only drawn once per data version
+@st.cache_resource
+def get_render_cache():
+    return LRUCache(max_entries = 512, max_bytes = 256 * 2**20, name = "render_cache")
 
-poss_lower_bounds = []
-poss_upper_bounds = []
+#The on-screen radar is a low DPI preview; most reruns are browsing, not exporting
+preview_key = (p1_key, p2_key, radar_category, PREVIEW_DPI, data_version)
+with profiler.span("render"):
+    radar_png = get_render_cache().get_or_compute(preview_key, lambda: render_png(category, *comparison_radar_args(), dpi = PREVIEW_DPI))
 
-shooting_upper_bounds = []
-shooting_lower_bounds = []
+with profiler.span("display"):
+    st.image(radar_png, use_container_width = True)
 
-for var in creating_vars:
-    creating_lower_bounds.append(creating_df[var].min())
-    creating_upper_bounds.append(creating_df[var].max())
 
-for var in defending_vars:
-    defending_lower_bounds.append(defending_df[var].min())
-    defending_upper_bounds.append(defending_df[var].max())
-    
-for var in poss_vars:
-    poss_lower_bounds.append(poss_df[var].min())
-    poss_upper_bounds.append(poss_df[var].max())
-    
-for var in shooting_vars:
-    shooting_lower_bounds.append(shooting_df[var].min())
-    shooting_upper_bounds.append(shooting_df[var].max())
-    
-creating_score = creating_df[(creating_df["Player"] == p1_name_selection) & (creating_df["Season"] == p1_season_selection)]["Score"].values.tolist()[0]
-creating_score2 = creating_df[(creating_df["Player"] == p2_name_selection) & (creating_df["Season"] == p2_season_selection)]["Score"].values.tolist()[0]
-
-defending_score = defending_df[(defending_df["Player"] == p1_name_selection) & (defending_df["Season"] == p1_season_selection)]["Score"].values.tolist()[0]
-defending_score2 = defending_df[(defending_df["Player"] == p2_name_selection) & (defending_df["Season"] == p2_season_selection)]["Score"].values.tolist()[0]
-
-poss_score = poss_df[(poss_df["Player"] == p1_name_selection) & (poss_df["Season"] == p1_season_selection)]["Score"].values.tolist()[0]
-poss_score2 = poss_df[(poss_df["Player"] == p2_name_selection) & (poss_df["Season"] == p2_season_selection)]["Score"].values.tolist()[0]
-
-shooting_score = shooting_df[(shooting_df["Player"] == p1_name_selection) & (shooting_df["Season"] == p1_season_selection)]["Score"].values.tolist()[0]
-shooting_score2 = shooting_df[(shooting_df["Player"] == p2_name_selection) & (shooting_df["Season"] == p2_season_selection)]["Score"].values.tolist()[0]
-
-creating1 = creating_df[(creating_df["Player"] == p1_name_selection) & (creating_df["Season"] == p1_season_selection)][creating_vars].values.tolist()[0]
-creating2 = creating_df[(creating_df["Player"] == p2_name_selection) & (creating_df["Season"] == p2_season_selection)][creating_vars].values.tolist()[0]
-
-defending1 = defending_df[(defending_df["Player"] == p1_name_selection) & (defending_df["Season"] == p1_season_selection)][defending_vars].values.tolist()[0]
-defending2 = defending_df[(defending_df["Player"] == p2_name_selection) & (defending_df["Season"] == p2_season_selection)][defending_vars].values.tolist()[0]
-
-poss1 = poss_df[(poss_df["Player"] == p1_name_selection) & (poss_df["Season"] == p1_season_selection)][poss_vars].values.tolist()[0]
-poss2 = poss_df[(poss_df["Player"] == p2_name_selection) & (poss_df["Season"] == p2_season_selection)][poss_vars].values.tolist()[0]
-
-shooting1 = shooting_df[(shooting_df["Player"] == p1_name_selection) & (shooting_df["Season"] == p1_season_selection)][shooting_vars].values.tolist()[0]
-shooting2 = shooting_df[(shooting_df["Player"] == p2_name_selection) & (shooting_df["Season"] == p2_season_selection)][shooting_vars].values.tolist()[0]
-
-player1_club = creating_df[(creating_df["Player"] == p1_name_selection) & (creating_df["Season"] == p1_season_selection)]["Squad"].values.tolist()[0].upper()
-player2_club = creating_df[(creating_df["Player"] == p2_name_selection) & (creating_df["Season"] == p2_season_selection)]["Squad"].values.tolist()[0].upper()
-
-player1_league = creating_df[(creating_df["Player"] == p1_name_selection) & (creating_df["Season"] == p1_season_selection)]["Comp"].values.tolist()[0].upper()
-player2_league = creating_df[(creating_df["Player"] == p2_name_selection) & (creating_df["Season"] == p2_season_selection)]["Comp"].values.tolist()[0].upper()
-
-player1_season = creating_df[(creating_df["Player"] == p1_name_selection) & (creating_df["Season"] == p1_season_selection)]["Season"].values.tolist()[0]
-player2_season = creating_df[(creating_df["Player"] == p2_name_selection) & (creating_df["Season"] == p2_season_selection)]["Season"].values.tolist()[0]
-
-players = [name.upper() for name in [p1_name_selection, p2_name_selection]]
-
-
-#radar
-if radar_category == "Creating":
-    radar = Radar(
-    params = creating_var_names, min_range = creating_lower_bounds, max_range =creating_upper_bounds,
-    round_int = [False] * len(creating_lower_bounds), num_rings = 4, ring_width = 1, center_circle_radius = 1
-    )
-
-    fig,  axs = grid(figheight = 14, grid_height =0.9, title_height = 0.06, endnote_height = 0.025, title_space = 0.015, endnote_space = 0, grid_key = "radar", axis = False)
-
-    radar.setup_axis(ax = axs["radar"])
-    rings_inner = radar.draw_circles(ax = axs["radar"], facecolor = "#fffefb", edgecolor = "#efe6d8")
-    radar_output = radar.draw_radar_compare(creating1, creating2, ax = axs["radar"],
-                                        kwargs_radar = {"facecolor": "#1c56a5", "alpha":0.8},
-                                        kwargs_compare = {"facecolor": "#06402B", "alpha":0.8})
-    radar_poly1, radar_poly2, vertices1, vertices2 = radar_output
-    range_labels = radar.draw_range_labels(ax = axs["radar"])
-    param_labels = radar.draw_param_labels(ax = axs["radar"], fontproperties = {"weight": "bold"}, fontsize = 15)
-    axs["radar"].scatter(vertices1[:,0], vertices1[:,1], c = "#1c56a5", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-    axs["radar"].scatter(vertices2[:,0], vertices2[:,1], c = "#06402B", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-
-    #Badge and Logo
-    newax = fig.add_axes([-0.035, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax.imshow(p1_badge)
-    newax.axis("off")
-
-    newax2 = fig.add_axes([0.975, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax2.imshow(p2_badge)
-    newax2.axis("off")
-
-    endnote_text = axs["endnote"].text(1, 0.5, "Viz by @TheNumbers_Game. Metrics log-transformed and Z-scored. Data from Opta.", fontsize = 10, ha = "right", va = "center")
-    title1_text = axs["title"].text(0.01, 0.65, players[0], fontsize = 30, ha = "left", va = "center", fontproperties = {"weight": "bold"})
-    title2_text = axs["title"].text(0.99, 0.65, players[1], fontsize = 30, ha = "right", va = "center", fontproperties = {"weight": "bold"})
-    subtitle1_text = axs["title"].text(0.01, 0.25, f"{player1_club} - {player1_league} - {player1_season}", fontsize = 17 , ha = "left", va = "center")
-    subtitle1_text = axs["title"].text(0.99, 0.25, f"{player2_club} - {player2_league} - {player2_season}", fontsize = 17 , ha = "right", va = "center")
-    category_text = axs["endnote"].text(0.05, 0.5, "CREATING", fontsize = 26, ha = "center", va = "center", fontproperties = {"weight": "bold"})
-
-    rectange1 = axs["title"].add_patch(plt.Rectangle((0.01, 0), 0.4, 0.1, facecolor = "#1c56a5", lw = 2, zorder = 1))
-    rectange2 = axs["title"].add_patch(plt.Rectangle((0.59, 0), 0.4, 0.1, facecolor = "#06402B", lw = 2, zorder = 1))
-
-    creating_score_text = axs["title"].text(0.02, -0.55, f"{creating_score:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff" ,fontproperties = {"weight": "bold"})
-    creating_score_text2 = axs["title"].text(0.95, -0.55, f"{creating_score2:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff", fontproperties = {"weight": "bold"})
-
-    creating_score_text.set_bbox(dict(facecolor = "#1c56a5", edgecolor = "none", boxstyle = "round,pad=0.3"))
-    creating_score_text2.set_bbox(dict(facecolor = "#06402B", edgecolor = "none", boxstyle = "round,pad=0.3"))
-
-    plt.tight_layout()
-
-elif radar_category == "Defense":
-    radar = Radar(
-        params = defending_var_names, min_range = defending_lower_bounds, max_range = defending_upper_bounds,
-        round_int = [False] * len(defending_lower_bounds), num_rings = 4,  ring_width = 1, center_circle_radius = 1
-    )
-
-    fig,  axs = grid(figheight = 14, grid_height =0.9, title_height = 0.06, endnote_height = 0.025, title_space = 0.015, endnote_space = 0, grid_key = "radar", axis = False)
-
-    radar.setup_axis(ax = axs["radar"])
-    rings_inner = radar.draw_circles(ax = axs["radar"], facecolor = "#fffefb", edgecolor = "#efe6d8")
-    radar_output = radar.draw_radar_compare(defending1, defending2, ax = axs["radar"],
-                                            kwargs_radar = {"facecolor": "#1c56a5", "alpha":0.8},
-                                            kwargs_compare = {"facecolor": "#06402B", "alpha":0.8})
-    radar_poly1, radar_poly2, vertices1, vertices2 = radar_output
-    range_labels = radar.draw_range_labels(ax = axs["radar"])
-    param_labels = radar.draw_param_labels(ax = axs["radar"], fontproperties = {"weight": "bold"}, fontsize = 15)
-    axs["radar"].scatter(vertices1[:,0], vertices1[:,1], c = "#1c56a5", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-    axs["radar"].scatter(vertices2[:,0], vertices2[:,1], c = "#06402B", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-
-    #Badge and Logo
-    newax = fig.add_axes([-0.035, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax.imshow(p1_badge)
-    newax.axis("off")
-
-    newax2 = fig.add_axes([0.975, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax2.imshow(p2_badge)
-    newax2.axis("off")
-
-    endnote_text = axs["endnote"].text(1, 0.5, "Viz by @TheNumbers_Game. Metrics log-transformed and Z-scored. Data from Opta.", fontsize = 10, ha = "right", va = "center")
-    title1_text = axs["title"].text(0.01, 0.65, players[0], fontsize = 30, ha = "left", va = "center", fontproperties = {"weight": "bold"})
-    title2_text = axs["title"].text(0.99, 0.65, players[1], fontsize = 30, ha = "right", va = "center", fontproperties = {"weight": "bold"})
-    subtitle1_text = axs["title"].text(0.01, 0.25, f"{player1_club} - {player1_league} - {player1_season}", fontsize = 17 , ha = "left", va = "center")
-    subtitle1_text = axs["title"].text(0.99, 0.25, f"{player2_club} - {player2_league} - {player2_season}", fontsize = 17 , ha = "right", va = "center")
-    category_text = axs["endnote"].text(0.05, 0.5, "DEFENDING", fontsize = 26, ha = "center", va = "center", fontproperties = {"weight": "bold"})
-
-    rectange1 = axs["title"].add_patch(plt.Rectangle((0.01, 0), 0.4, 0.1, facecolor = "#1c56a5", lw = 2, zorder = 1))
-    rectange2 = axs["title"].add_patch(plt.Rectangle((0.59, 0), 0.4, 0.1, facecolor = "#06402B", lw = 2, zorder = 1))
-
-    score_text = axs["title"].text(0.02, -0.55, f"{defending_score:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff" ,fontproperties = {"weight": "bold"})
-    score_text2 = axs["title"].text(0.95, -0.55, f"{defending_score2:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff", fontproperties = {"weight": "bold"})
-
-    score_text.set_bbox(dict(facecolor = "#1c56a5", edgecolor = "none", boxstyle = "round,pad=0.3"))
-    score_text2.set_bbox(dict(facecolor = "#06402B", edgecolor = "none", boxstyle = "round,pad=0.3"))
-
-    plt.tight_layout()
-    
-elif radar_category == "Possession":
-    radar = Radar(
-        params = poss_var_names, min_range = poss_lower_bounds,
-        max_range = poss_upper_bounds, round_int = [False] * len(poss_lower_bounds),
-        num_rings = 4, ring_width = 1,
-        center_circle_radius = 1
-    )
-
-    fig,  axs = grid(figheight = 14, grid_height =0.9, title_height = 0.06, endnote_height = 0.025, title_space = 0.015, endnote_space = 0, grid_key = "radar", axis = False)
-
-    radar.setup_axis(ax = axs["radar"])
-    rings_inner = radar.draw_circles(ax = axs["radar"], facecolor = "#fffefb", edgecolor = "#efe6d8")
-    radar_output = radar.draw_radar_compare(poss1, poss2, ax = axs["radar"],
-                                            kwargs_radar = {"facecolor": "#1c56a5", "alpha":0.8},
-                                            kwargs_compare = {"facecolor": "#06402B", "alpha":0.8})
-    radar_poly1, radar_poly2, vertices1, vertices2 = radar_output
-    range_labels = radar.draw_range_labels(ax = axs["radar"])
-    param_labels = radar.draw_param_labels(ax = axs["radar"], fontproperties = {"weight": "bold"}, fontsize = 15)
-    axs["radar"].scatter(vertices1[:,0], vertices1[:,1], c = "#1c56a5", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-    axs["radar"].scatter(vertices2[:,0], vertices2[:,1], c = "#06402B", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-
-    #Badge and Logo
-    newax = fig.add_axes([-0.035, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax.imshow(p1_badge)
-    newax.axis("off")
-
-    newax2 = fig.add_axes([0.975, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax2.imshow(p2_badge)
-    newax2.axis("off")
-
-    endnote_text = axs["endnote"].text(1, 0.5, "Viz by @TheNumbers_Game. Metrics log-transformed and Z-scored. Data from Opta.", fontsize = 10, ha = "right", va = "center")
-    title1_text = axs["title"].text(0.01, 0.65, players[0], fontsize = 30, ha = "left", va = "center", fontproperties = {"weight": "bold"})
-    title2_text = axs["title"].text(0.99, 0.65, players[1], fontsize = 30, ha = "right", va = "center", fontproperties = {"weight": "bold"})
-    subtitle1_text = axs["title"].text(0.01, 0.25, f"{player1_club} - {player1_league} - {player1_season}", fontsize = 17 , ha = "left", va = "center")
-    subtitle1_text = axs["title"].text(0.99, 0.25, f"{player2_club} - {player2_league} - {player2_season}", fontsize = 17 , ha = "right", va = "center")
-    category_text = axs["endnote"].text(0.05, 0.5, "POSSESSION", fontsize = 26, ha = "center", va = "center", fontproperties = {"weight": "bold"})
-
-    rectange1 = axs["title"].add_patch(plt.Rectangle((0.01, 0), 0.4, 0.1, facecolor = "#1c56a5", lw = 2, zorder = 1))
-    rectange2 = axs["title"].add_patch(plt.Rectangle((0.59, 0), 0.4, 0.1, facecolor = "#06402B", lw = 2, zorder = 1))
-
-    score_text = axs["title"].text(0.02, -0.55, f"{poss_score:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff" ,fontproperties = {"weight": "bold"})
-    score_text2 = axs["title"].text(0.95, -0.55, f"{poss_score2:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff", fontproperties = {"weight": "bold"})
-
-    score_text.set_bbox(dict(facecolor = "#1c56a5", edgecolor = "none", boxstyle = "round,pad=0.3"))
-    score_text2.set_bbox(dict(facecolor = "#06402B", edgecolor = "none", boxstyle = "round,pad=0.3"))
-
-    plt.tight_layout()
-    
-elif radar_category == "Shooting":
-    radar = Radar(
-        params = shooting_var_names, min_range = shooting_lower_bounds,
-        max_range = shooting_upper_bounds,
-        round_int = [False] * len(shooting_lower_bounds),
-        num_rings = 4, ring_width = 1, center_circle_radius = 1
-    )
-
-    fig,  axs = grid(figheight = 14, grid_height =0.9, title_height = 0.06, endnote_height = 0.025, title_space = 0.015, endnote_space = 0, grid_key = "radar", axis = False)
-
-    radar.setup_axis(ax = axs["radar"])
-    rings_inner = radar.draw_circles(ax = axs["radar"], facecolor = "#fffefb", edgecolor = "#efe6d8")
-    radar_output = radar.draw_radar_compare(shooting1, shooting2, ax = axs["radar"],
-                                            kwargs_radar = {"facecolor": "#1c56a5", "alpha":0.8},
-                                            kwargs_compare = {"facecolor": "#06402B", "alpha":0.8})
-    radar_poly1, radar_poly2, vertices1, vertices2 = radar_output
-    range_labels = radar.draw_range_labels(ax = axs["radar"])
-    param_labels = radar.draw_param_labels(ax = axs["radar"], fontproperties = {"weight": "bold"}, fontsize = 15)
-    axs["radar"].scatter(vertices1[:,0], vertices1[:,1], c = "#1c56a5", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-    axs["radar"].scatter(vertices2[:,0], vertices2[:,1], c = "#06402B", edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
-
-    #Badge and Logo
-    newax = fig.add_axes([-0.035, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax.imshow(p1_badge)
-    newax.axis("off")
-
-    newax2 = fig.add_axes([0.975, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
-    newax2.imshow(p2_badge)
-    newax2.axis("off")
-
-    endnote_text = axs["endnote"].text(1, 0.5, "Viz by @TheNumbers_Game. Metrics log-transformed and Z-scored. Data from Opta.", fontsize = 10, ha = "right", va = "center")
-    title1_text = axs["title"].text(0.01, 0.65, players[0], fontsize =30, ha = "left", va = "center", fontproperties = {"weight": "bold"})
-    title2_text = axs["title"].text(0.99, 0.65, players[1], fontsize = 30, ha = "right", va = "center", fontproperties = {"weight": "bold"})
-    subtitle1_text = axs["title"].text(0.01, 0.25, f"{player1_club} - {player1_league} - {player1_season}", fontsize = 17 , ha = "left", va = "center")
-    subtitle1_text = axs["title"].text(0.99, 0.25, f"{player2_club} - {player2_league} - {player2_season}", fontsize = 17 , ha = "right", va = "center")
-    category_text = axs["endnote"].text(0.05, 0.5, "SHOOTING", fontsize = 26, ha = "center", va = "center", fontproperties = {"weight": "bold"})
-
-    rectange1 = axs["title"].add_patch(plt.Rectangle((0.01, 0), 0.4, 0.1, facecolor = "#1c56a5", lw = 2, zorder = 1))
-    rectange2 = axs["title"].add_patch(plt.Rectangle((0.59, 0), 0.4, 0.1, facecolor = "#06402B", lw = 2, zorder = 1))
-
-    score_text = axs["title"].text(0.02, -0.55, f"{shooting_score:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff" ,fontproperties = {"weight": "bold"})
-    score_text2 = axs["title"].text(0.95, -0.55, f"{shooting_score2:.0f}", fontsize = 25, ha = "left", va = "center", color = "#ffffff", fontproperties = {"weight": "bold"})
-
-    score_text.set_bbox(dict(facecolor = "#1c56a5", edgecolor = "none", boxstyle = "round,pad=0.3"))
-    score_text2.set_bbox(dict(facecolor = "#06402B", edgecolor = "none", boxstyle = "round,pad=0.3"))
-    
-    plt.tight_layout()
-
-    
-        
-
-st.pyplot(fig)
+#The full resolution PNG is only encoded when a download is asked for, on a background thread,
+#and lands in the shared render cache so repeat downloads are instant
+@st.cache_resource
+def get_export_queue():
+    return ExportQueue(get_render_cache())
 
+export_key = (p1_key, p2_key, radar_category, RENDER_DPI, data_version)
 filename = "radar.png"
 
-buf = io.BytesIO()
-fig.savefig(buf, format = "png", bbox_inches = "tight")
-
-
-st.download_button(
-    label = "Download Viz",
-    data = buf,
-    file_name = filename,
-    mime = "image/png"
-)
-
-
-
-
-
+export_queue = get_export_queue()
+export_owner = st.session_state.setdefault("Export_Owner", object())
+
+#Moving on to another comparison drops this session's export if it hasn't started yet
+export_queue.supersede(export_owner, export_key)
+
+#An export still running at a full rerun is polled on a timer; one started from the panel polls
+#by rerunning just the fragment, so waiting for it never reruns the whole script
+export_polling = export_queue.pending(export_key)
+
+def download_panel():
+    if export_queue.get(export_key) is None and not export_queue.pending(export_key):
+        if export_queue.failed(export_key):
+            st.error("Couldn't render the full resolution radar, please try again.")
+        if st.button("Prepare download"):
+            export_queue.submit(export_owner, export_key, category, comparison_radar_args())
+
+    radar_png = export_queue.get(export_key)
+    if radar_png is not None:
+        st.download_button(
+            label = "Download Viz",
+            data = radar_png,
+            file_name = filename,
+            mime = "image/png",
+            on_click = "ignore"
+        )
+    elif export_queue.pending(export_key) and not export_polling:
+        st.caption("Rendering full resolution radar...")
+        #A click folded into a full rerun can't rerun just the fragment, so the next run sets the timer
+        if panel_full_run:
+            st.rerun()
+        time.sleep(0.5)
+        st.rerun(scope = "fragment")
+    elif export_queue.pending(export_key):
+        st.caption("Rendering full resolution radar...")
+
+panel_full_run = True
+st.fragment(download_panel, run_every = 0.5 if export_polling else None)()
+panel_full_run = False
+
+
+#Percentiles against each player's own position group and season, built once per data version
+@st.cache_resource(max_entries = 2)
+def get_percentile_index(data_version, _df_clean):
+    record_cache("percentile_index", False)
+    return PercentileIndex(_df_clean)
+
+with profiler.loader("percentile_index"):
+    percentile_index = get_percentile_index(data_version, df_clean)
+
+st.subheader("Percentiles")
+percentile_caption = "Percentile of each player's per 90 value among players in the same position group and season."
+lower_names = [name for var, name in zip(category["vars"], category["var_names"]) if var in lower_is_better]
+if lower_names:
+    percentile_caption += f" Lower is better for {' and '.join(lower_names)}, so the lowest values rank highest."
+st.caption(percentile_caption)
+with profiler.span("percentiles"):
+    percentile_df = pd.DataFrame({
+        "Metric": category["var_names"],
+        p1_name_selection: percentile_index.player_percentiles(p1_row, category),
+        p2_name_selection: percentile_index.player_percentiles(p2_row, category),
+    }).set_index("Metric")
+
+#Comparing a player to themselves gives duplicate column names
+percentile_df = percentile_df.loc[:, ~percentile_df.columns.duplicated()]
+
+st.dataframe(percentile_df, use_container_width = True,
+             column_config = {name: st.column_config.ProgressColumn(label = name, format = "%.0f", min_value = 0, max_value = 100) for name in percentile_df.columns})
+
+
+#Similar players
+#KD-tree per (Player 1 position group, category), built on first use and shared by every session
+@st.cache_resource
+def get_similarity_cache():
+    return LRUCache(max_entries = 64, max_bytes = 256 * 2**20, name = "similarity_cache")
+
+st.subheader("Similar Players")
+if st.toggle("Find players similar to Player 1", key = "Similar_Toggle"):
+    similar_k = st.slider(label = "Number of players", min_value = 5, max_value = 50, value = 10, key = "Similar_K")
+    similar_weighted = st.checkbox(label = "Weight metrics by the category weights", value = True, key = "Similar_Weighted")
+
+    p1_groups = position_groups([p1_row["Pos"]])
+    similarity_key = (p1_groups, data_version, radar_category, similar_weighted)
+    with profiler.span("similarity"):
+        similarity_index = get_similarity_cache().get_or_compute(similarity_key, lambda: SimilarityIndex(get_category_scores(p1_groups, radar_category), category, weighted = similar_weighted))
+        similar_players = similarity_index.query(p1_key, similar_k)
+
+    st.caption(f"{radar_category} profiles closest to {p1_name_selection} ({p1_season_selection}) among {p1_row['Pos']} players in all five leagues.")
+    st.dataframe(similar_players, hide_index = True, use_container_width = True)
+
+
+#Leaderboard
+#Pages are cut from the shared score tables by partial selection, so filtering and paging never rescore
+st.subheader("Leaderboard")
+if st.toggle("Show the top players in this category", key = "Leaderboard_Toggle"):
+    position_prefixes = sorted({pos.split(",")[0] for pos in df_clean["Pos"].cat.categories})
+    league_options = ["All leagues"] + sorted(df_clean["Comp"].cat.categories)
+    season_options = ["All seasons"] + sorted(df_clean["Season"].cat.categories, reverse = True)
+
+    position_col, league_col, season_col = st.columns(3)
+    board_position = position_col.selectbox(label = "Position", options = position_prefixes, index = position_prefixes.index(p1_row["Pos"].split(",")[0]), key = "Leaderboard_Position")
+    board_league = league_col.selectbox(label = "League", options = league_options, key = "Leaderboard_League")
+    board_season = season_col.selectbox(label = "Season", options = season_options, index = season_options.index(p1_season_selection), key = "Leaderboard_Season")
+
+    size_col, page_col = st.columns(2)
+    board_k = size_col.selectbox(label = "Players per page", options = [10, 25, 50], key = "Leaderboard_K")
+    board_page = page_col.number_input(label = "Page", min_value = 1, value = 1, step = 1, key = "Leaderboard_Page")
+
+    with profiler.span("leaderboard"):
+        board, qualified = leaderboard(get_category_scores((board_position,), radar_category), board_k, page = board_page - 1,
+                                       comp = None if board_league == league_options[0] else board_league,
+                                       season = None if board_season == season_options[0] else board_season)
+
+    #Clicking a row loads that player into the comparison as Player 1
+    def load_board_player():
+        selected = st.session_state["Leaderboard_Table"].selection.rows
+        if selected:
+            player = board.iloc[selected[0]]
+            st.session_state["P1_Squad"] = player["Squad"]
+            st.session_state["P1_Season"] = player["Season"]
+            st.session_state["P1_Name"] = player["Player"]
+
+    st.caption(f"{qualified} player-seasons, scored against every player whose position starts with {board_position} in all five leagues. Click a row to load them as Player 1.")
+    st.dataframe(board, hide_index = True, use_container_width = True,
+                 column_order = ["Rank", "Player", "Squad", "Comp", "Season", "Score"],
+                 column_config = {"Score": st.column_config.NumberColumn(format = "%.1f")},
+                 on_select = load_board_player, selection_mode = "single-row", key = "Leaderboard_Table")
+
+
+#Speculative work for this session's likely next reruns: the other categories for the current pair,
+#then Player 1 against their teammates in the current category. Scheduling replaces whatever this
+#session had queued before.
+def speculative_comparisons(max_teammates = 6):
+    comparisons = [([p1_key, p2_key], [p1_row, p2_row], name) for name in categories if name != radar_category]
+    teammates = [name for name in player_index.player_options(p1_squad_selection, p1_season_selection) if name not in (p1_name_selection, p2_name_selection)]
+    for name in teammates[:max_teammates]:
+        mate_key = (name, p1_season_selection, p1_squad_selection)
+        comparisons.append(([p1_key, mate_key], [p1_row, player_index.row(*mate_key)], radar_category))
+    return comparisons
+
+prefetch_owner = st.session_state.setdefault("Prefetch_Owner", object())
+prefetcher.schedule(prefetch_owner, [comparison_task(df_clean, data_version, get_score_cache(), get_render_cache(), badge_atlas, keys, rows, name)
+                                     for keys, rows, name in speculative_comparisons()])
+
+
+#Diagnostics
+rerun_summary = profiler.log(data_version = data_version, category = radar_category, player1 = p1_key, player2 = p2_key)
+
+if st.sidebar.checkbox(label = "Show diagnostics", key = "Diagnostics"):
+    with st.sidebar.expander("Diagnostics", expanded = True):
+        st.caption(f"Rerun took {rerun_summary['total_ms']:.0f} ms, process memory {rerun_summary['rss_mb']} MB.")
+        st.dataframe(pd.DataFrame.from_dict(rerun_summary["spans"], orient = "index"), use_container_width = True)
+        st.dataframe(pd.DataFrame.from_dict(rerun_summary["caches"], orient = "index"), use_container_width = True)
+
+        #Lifetime stats of the shared caches, across every session
+        shared_caches = {"score_cache": get_score_cache(), "render_cache": get_render_cache(), "similarity_cache": get_similarity_cache()}
+        cache_stats = pd.DataFrame({name: cache.stats() for name, cache in shared_caches.items()}).T
+        cache_stats["bytes"] = (cache_stats["bytes"] / 2**20).round(1)
+        st.dataframe(cache_stats.rename(columns = {"bytes": "MB"}), use_container_width = True)
+        st.caption("Background prefetch: " + ", ".join(f"{count} {name}" for name, count in prefetcher.stats().items()))
+
+#The rerun is done; speculative work can use the CPU again
+prefetcher.end(profiler)
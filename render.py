@@ -0,0 +1,300 @@
+#Drawing and encoding the player comparison radar
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+from mplsoccer import Radar, grid
+
+from profiling import span
+
+p1_colour = "#1c56a5"
+p2_colour = "#06402B"
+
+#Resolution of the downloadable PNG (st.pyplot used 200 dpi for the on-screen image)
+RENDER_DPI = 200
+
+#On-screen preview resolution. The tight figure is about 14.3 inches wide, so 100 dpi stays under
+#st.image's 1460px maximum and the PNG is sent as is instead of being resized and re-encoded.
+PREVIEW_DPI = 100
+
+#Templates are shared figures, so sessions take turns drawing
+render_lock = threading.Lock()
+
+
+num_rings = 4
+ring_width = 1
+center_circle_radius = 1
+
+
+#Same vertex geometry as Radar.draw_radar_compare, for the given axis bounds
+def radar_vertices(radar, values, lower_bounds, upper_bounds):
+    lower_bounds = np.asarray(lower_bounds, dtype = float)
+    upper_bounds = np.asarray(upper_bounds, dtype = float)
+    values = np.clip(np.asarray(values, dtype = float), np.minimum(lower_bounds, upper_bounds), np.maximum(lower_bounds, upper_bounds))
+
+    proportion = np.abs(values - lower_bounds)/np.abs(upper_bounds - lower_bounds)
+    radius = proportion*num_rings*ring_width + center_circle_radius
+    return np.c_[radar.rotation_sin*radius, radar.rotation_cos*radius]
+
+
+#Same label strings (and order) as Radar.draw_range_labels, for the given axis bounds
+def range_label_strings(lower_bounds, upper_bounds):
+    lower_bounds = np.asarray(lower_bounds, dtype = float)
+    upper_bounds = np.asarray(upper_bounds, dtype = float)
+    label_values = np.linspace(lower_bounds, upper_bounds, num = num_rings + 1, axis = 1)[:, 1:]
+    label_formats = np.where(np.maximum(lower_bounds, upper_bounds) <= 1, "%.2f", "%.1f")
+    return [label_format % value for label_format, row in zip(label_formats, label_values) for value in row]
+
+
+#One pre-laid-out figure per category. Everything that doesn't depend on the players (grid, rings,
+#axis names, bars, endnotes) is drawn once; update() only touches the polygons, vertex markers,
+#range labels, badges and texts.
+class RadarTemplate:
+    def __init__(self, category):
+        n_params = len(category["var_names"])
+        placeholder = [0.5] * n_params
+
+        self.radar = Radar(
+            params = category["var_names"], min_range = [0] * n_params, max_range = [1] * n_params,
+            round_int = [False] * n_params, num_rings = num_rings, ring_width = ring_width, center_circle_radius = center_circle_radius
+        )
+
+        fig,  axs = grid(figheight = 14, grid_height =0.9, title_height = 0.06, endnote_height = 0.025, title_space = 0.015, endnote_space = 0, grid_key = "radar", axis = False)
+
+        self.radar.setup_axis(ax = axs["radar"])
+        self.radar.draw_circles(ax = axs["radar"], facecolor = "#fffefb", edgecolor = "#efe6d8")
+        self.poly1, self.poly2, vertices1, vertices2 = self.radar.draw_radar_compare(placeholder, placeholder, ax = axs["radar"],
+                                                                                 kwargs_radar = {"facecolor": p1_colour, "alpha":0.8},
+                                                                                 kwargs_compare = {"facecolor": p2_colour, "alpha":0.8})
+        self.range_labels = self.radar.draw_range_labels(ax = axs["radar"])
+        self.radar.draw_param_labels(ax = axs["radar"], fontproperties = {"weight": "bold"}, fontsize = 15)
+        self.scatter1 = axs["radar"].scatter(vertices1[:,0], vertices1[:,1], c = p1_colour, edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
+        self.scatter2 = axs["radar"].scatter(vertices2[:,0], vertices2[:,1], c = p2_colour, edgecolors = "#6d6c6d", marker = "o", s = 150, zorder = 2)
+
+        #Badge and Logo
+        blank = np.zeros((1, 1, 4), dtype = np.uint8)
+        newax = fig.add_axes([-0.035, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
+        self.badge1 = newax.imshow(blank)
+        newax.axis("off")
+
+        newax2 = fig.add_axes([0.975, 0.94, 0.055, 0.055], anchor = "C", zorder = 10)
+        self.badge2 = newax2.imshow(blank)
+        newax2.axis("off")
+
+        axs["endnote"].text(1, 0.5, "Viz by @TheNumbers_Game. Metrics log-transformed and Z-scored. Data from Opta.", fontsize = 10, ha = "right", va = "center")
+        self.title1_text = axs["title"].text(0.01, 0.65, "", fontsize = 30, ha = "left", va = "center", fontproperties = {"weight": "bold"})
+        self.title2_text = axs["title"].text(0.99, 0.65, "", fontsize = 30, ha = "right", va = "center", fontproperties = {"weight": "bold"})
+        self.subtitle1_text = axs["title"].text(0.01, 0.25, "", fontsize = 17 , ha = "left", va = "center")
+        self.subtitle2_text = axs["title"].text(0.99, 0.25, "", fontsize = 17 , ha = "right", va = "center")
+        axs["endnote"].text(0.05, 0.5, category["label"], fontsize = 26, ha = "center", va = "center", fontproperties = {"weight": "bold"})
+
+        axs["title"].add_patch(plt.Rectangle((0.01, 0), 0.4, 0.1, facecolor = p1_colour, lw = 2, zorder = 1))
+        axs["title"].add_patch(plt.Rectangle((0.59, 0), 0.4, 0.1, facecolor = p2_colour, lw = 2, zorder = 1))
+
+        self.score_text = axs["title"].text(0.02, -0.55, "", fontsize = 25, ha = "left", va = "center", color = "#ffffff" ,fontproperties = {"weight": "bold"})
+        self.score_text2 = axs["title"].text(0.95, -0.55, "", fontsize = 25, ha = "left", va = "center", color = "#ffffff", fontproperties = {"weight": "bold"})
+
+        self.score_text.set_bbox(dict(facecolor = p1_colour, edgecolor = "none", boxstyle = "round,pad=0.3"))
+        self.score_text2.set_bbox(dict(facecolor = p2_colour, edgecolor = "none", boxstyle = "round,pad=0.3"))
+
+        fig.tight_layout()
+
+        #The template lives outside pyplot's figure registry; close() releases it
+        plt.close(fig)
+        self.fig = fig
+
+    #players, values, scores, subtitles and badges are [player 1, player 2] pairs
+    def update(self, lower_bounds, upper_bounds, players, values, scores, subtitles, badges):
+        vertices1 = radar_vertices(self.radar, values[0], lower_bounds, upper_bounds)
+        vertices2 = radar_vertices(self.radar, values[1], lower_bounds, upper_bounds)
+        self.poly1.set_xy(vertices1)
+        self.poly2.set_xy(vertices2)
+        self.scatter1.set_offsets(vertices1)
+        self.scatter2.set_offsets(vertices2)
+
+        for text, label in zip(self.range_labels, range_label_strings(lower_bounds, upper_bounds)):
+            text.set_text(label)
+
+        self.badge1.set_data(badges[0])
+        self.badge1.set_extent((-0.5, badges[0].shape[1] - 0.5, badges[0].shape[0] - 0.5, -0.5))
+        self.badge2.set_data(badges[1])
+        self.badge2.set_extent((-0.5, badges[1].shape[1] - 0.5, badges[1].shape[0] - 0.5, -0.5))
+
+        self.title1_text.set_text(players[0])
+        self.title2_text.set_text(players[1])
+        self.subtitle1_text.set_text(subtitles[0])
+        self.subtitle2_text.set_text(subtitles[1])
+        self.score_text.set_text(f"{scores[0]:.0f}")
+        self.score_text2.set_text(f"{scores[1]:.0f}")
+
+        return self.fig
+
+    def close(self):
+        self.fig.clear()
+
+
+#Category label -> template, built on first use and reused for the life of the process.
+#Full resolution exports and speculative background renders draw on their own templates under
+#their own locks, so work off the request path never holds up the on-screen previews.
+templates = {}
+export_templates = {}
+export_lock = threading.Lock()
+prefetch_templates = {}
+prefetch_lock = threading.Lock()
+
+template_sets = {
+    "preview": (render_lock, templates),
+    "export": (export_lock, export_templates),
+    "prefetch": (prefetch_lock, prefetch_templates),
+}
+
+
+def get_template(category, pool = templates):
+    if category["label"] not in pool:
+        with span("template_build"):
+            pool[category["label"]] = RadarTemplate(category)
+    return pool[category["label"]]
+
+
+#Drops every template figure, e.g. when a worker shuts down
+def release_templates():
+    for lock, pool in template_sets.values():
+        with lock:
+            for template in pool.values():
+                template.close()
+            pool.clear()
+
+
+#Radar arguments for a comparison, from a category score pool and the two players' rows and keys
+def comparison_args(category_scores, category, player_rows, player_keys, badge_atlas):
+    score_df = category_scores["df"]
+
+    #player rows within the position pool score table
+    pool_rows = [category_scores["rows"][key] for key in player_keys]
+
+    players = [row["Player"].upper() for row in player_rows]
+    values = [score_df.iloc[i][category["vars"]].tolist() for i in pool_rows]
+    scores = [score_df["Score"].iat[i] for i in pool_rows]
+    subtitles = [f"{row['Squad'].upper()} - {row['Comp'].upper()} - {row['Season']}" for row in player_rows]
+    badges = [badge_atlas.get(row["Squad"]) for row in player_rows]
+
+    return category_scores["lower_bounds"], category_scores["upper_bounds"], players, values, scores, subtitles, badges
+
+
+#Radar arguments for a player against the average of their score pool's players from one league and
+#season. The pool is the player's position group, so this is their league-position benchmark.
+def benchmark_args(category_scores, category, player_row, player_key, comp, season, badge_atlas):
+    score_df = category_scores["df"]
+    peers = score_df[((score_df["Comp"] == comp) & (score_df["Season"] == season)).to_numpy()]
+    if peers.empty:
+        raise ValueError(f"No {player_row['Pos']} players in {comp} {season} to benchmark against")
+
+    lower_bounds, upper_bounds, players, values, scores, subtitles, badges = comparison_args(category_scores, category, [player_row], [player_key], badge_atlas)
+    players.append(f"{comp.upper()} AVERAGE")
+    values.append(peers[category["vars"]].mean().tolist())
+    scores.append(peers["Score"].mean())
+    subtitles.append(f"{player_row['Pos']} - {len(peers)} PLAYERS - {season}")
+    badges.append(badge_atlas.get(comp))
+
+    return lower_bounds, upper_bounds, players, values, scores, subtitles, badges
+
+
+def encode_png(fig, dpi = RENDER_DPI):
+    buf = io.BytesIO()
+    fig.savefig(buf, format = "png", bbox_inches = "tight", dpi = dpi)
+    return buf.getvalue()
+
+
+#Vector output for embedding; badges are embedded as images and text stays selectable.
+#No date and a fixed id salt, so the same comparison always encodes to the same bytes.
+def encode_svg(fig):
+    buf = io.BytesIO()
+    with plt.rc_context({"svg.hashsalt": "st-radars"}):
+        fig.savefig(buf, format = "svg", bbox_inches = "tight", metadata = {"Date": None})
+    return buf.getvalue()
+
+
+#Updates the category's template with the comparison and encodes it
+def render_png(category, *radar_args, dpi = RENDER_DPI, template_set = "preview"):
+    lock, pool = template_sets[template_set]
+    with lock:
+        with span("figure_update"):
+            fig = get_template(category, pool).update(*radar_args)
+        with span("png_encode"):
+            return encode_png(fig, dpi = dpi)
+
+
+def render_svg(category, *radar_args):
+    with render_lock:
+        with span("figure_update"):
+            fig = get_template(category).update(*radar_args)
+        with span("svg_encode"):
+            return encode_svg(fig)
+
+
+#Full resolution PNGs, encoded on a background thread once a download is asked for.
+#Finished files go into the shared render cache; asking again while one is being encoded shares
+#the running job. Each owner (e.g. a session) waits on at most one job, so clicking through
+#comparisons never leaves stale encodes queued ahead of the current one.
+class ExportQueue:
+    def __init__(self, cache, workers = 1):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "radar-export")
+        self.jobs = {}
+        self.owners = {}
+        self._lock = threading.Lock()
+
+    #Drops the owner's queued job unless it is for key. Running jobs, and jobs another owner is
+    #waiting for, are left to finish.
+    def supersede(self, owner, key):
+        with self._lock:
+            self._supersede(owner, key)
+
+    def _supersede(self, owner, key):
+        previous = self.owners.get(owner)
+        if previous is None or previous == key:
+            return
+        del self.owners[owner]
+        if previous in self.owners.values():
+            return
+        job = self.jobs.get(previous)
+        if job is not None and job.cancel():
+            del self.jobs[previous]
+
+    #A failed job is retried; a queued or running one is shared
+    def submit(self, owner, key, category, radar_args, dpi = RENDER_DPI):
+        with self._lock:
+            self._supersede(owner, key)
+            if key in self.cache:
+                return
+            self.owners[owner] = key
+            job = self.jobs.get(key)
+            if job is None or job.done():
+                self.jobs[key] = self.executor.submit(self._encode, key, category, radar_args, dpi)
+
+    def _encode(self, key, category, radar_args, dpi):
+        try:
+            png = self.cache.put(key, render_png(category, *radar_args, dpi = dpi, template_set = "export"))
+            with self._lock:
+                self.jobs.pop(key, None)
+            return png
+        finally:
+            with self._lock:
+                self.owners = {owner: owner_key for owner, owner_key in self.owners.items() if owner_key != key}
+
+    #The encoded PNG if it is ready, otherwise None
+    def get(self, key):
+        return self.cache.get(key)
+
+    def pending(self, key):
+        with self._lock:
+            job = self.jobs.get(key)
+        return job is not None and not job.done()
+
+    #A failed job is kept (until retried) so the failure can be reported
+    def failed(self, key):
+        with self._lock:
+            job = self.jobs.get(key)
+        return job is not None and job.done() and not job.cancelled() and job.exception() is not None
@@ -0,0 +1,162 @@
+#Radar category definitions and the scoring engine shared by the app and offline tools
+import numpy as np
+import pandas as pd
+
+from lookup import row_index
+from profiling import span
+
+id_vars = ["Season", "Squad", "Comp", "Player"]
+
+#Both sides of a comparison, as named by batch job lists and server query strings
+job_columns = ["player1", "season1", "squad1", "player2", "season2", "squad2"]
+
+creating_vars = ["CPA_Carries", "PPA", "Att Pen_Touches", "KP", "xA_per_KP", "SCA90_SCA", "xA_Expected", "CrsPA", "TB_Pass"]
+creating_weights = [0.11, 0.11, 0.08, 0.11, 0.11, 0.16, 0.16, 0.08, 0.08]
+
+defending_vars = ["Recov", "Def 3rd_Tackles", "Mid 3rd_Tackles", "Att 3rd_Tackles", "Tkl_percent_Challenges", "Att_Challenges", "Blocks_Blocks", "Int", "Clr", "Att_Aerial", "Won_percent_Aerial"]
+defending_weights = [0.08, 0.07, 0.07, 0.1, 0.13, 0.1, 0.08, 0.08, 0.08, 0.08, 0.13]
+
+poss_vars = ["Cmp_percent_Total", "Cmp_Total", "PrgP", "PrgDist_Total", "PrgR_Receiving", "Final_Third", "PrgC_Carries", "PrgDist_Carries", "Final_Third_Carries", "Att_Take", "Succ_percent_Take", "Touches_Touches"]
+poss_weights = [0.0825, 0.0825, 0.0825, 0.0625, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0825, 0.0725]
+
+shooting_vars = ["np:G_minus_xG_Expected", "npxG_Expected", "npxG_per_Sh_Expected", "Dist_Standard", "Sh_per_90_Standard", "Sh_per_100_Touches", "PA_Touches_per_Sh"]
+shooting_weights = [0.17, 0.16, 0.145, -0.135, 0.14, 0.125, -0.125]
+
+creating_var_names = ["Carries into PA", "Passes into PA", "PA Touches", "Key Passes", "xA per KP", "SCA", "xA", "Crosses into PA", "Through Balls"]
+defending_var_names = ["Recoveries", "Def 3rd Tackles", "Mid 3rd Tackles", "Final 3rd Tackles", "Ground Duel Success", "Ground Duels", "Blocks", "interceptions", "Clearances", "Aerial Duels", "Aerial Duel Success"]
+poss_var_names = ["Pass Completion", "Passes", "Prog Passes", "Prog Pass Dist", "Prog Pass Receptions", "Passes into FT", "Prog Carries", "Prog Carry Dist", "Final Third Carries", "Take-Ons", "Take-On Success", "Touches"]
+shooting_var_names = ["npG - xG", "npxG", "npxG per Shot", "Avg. Shot Distance", "Shots per 90", "Propensity to Shoot", "PA Touches per Shot"]
+
+#Category name (as shown in the sidebar) -> metrics, weights, axis labels and endnote label
+categories = {
+    "Creating": {"vars": creating_vars, "weights": creating_weights, "var_names": creating_var_names, "label": "CREATING"},
+    "Possession": {"vars": poss_vars, "weights": poss_weights, "var_names": poss_var_names, "label": "POSSESSION"},
+    "Defense": {"vars": defending_vars, "weights": defending_weights, "var_names": defending_var_names, "label": "DEFENDING"},
+    "Shooting": {"vars": shooting_vars, "weights": shooting_weights, "var_names": shooting_var_names, "label": "SHOOTING"},
+}
+
+#Metrics that can be negative, so they are Z-scored without the log transform
+raw_vars = ["np:G_minus_xG_Expected"]
+
+#Metrics where a lower value is better, i.e. those with a negative weight in their category's score
+lower_is_better = [var for category in categories.values() for var, weight in zip(category["vars"], category["weights"]) if weight < 0]
+
+
+#Union of the metrics used by the given categories and the matching (metric x category) weight matrix
+def weight_matrix(category_names):
+    columns = list(dict.fromkeys(var for name in category_names for var in categories[name]["vars"]))
+    position = {var: i for i, var in enumerate(columns)}
+
+    weights = np.zeros((len(columns), len(category_names)))
+    for j, name in enumerate(category_names):
+        for var, weight in zip(categories[name]["vars"], categories[name]["weights"]):
+            weights[position[var], j] = weight
+
+    return columns, weights
+
+
+#Log transform, Z-score, weight and 0-100 rescale a (players x metrics) matrix in one pass.
+#Matches the per column StandardScaler / MinMaxScaler steps: population std, NaNs ignored when fitting.
+def score_matrix(values, raw_mask, weights):
+    values = np.asarray(values, dtype = np.float64)
+    logged = np.log(values + 0.1, out = values.copy(), where = ~raw_mask)
+
+    mean = np.nanmean(logged, axis = 0)
+    std = np.nanstd(logged, axis = 0)
+    std[std == 0] = 1
+    z_scores = (logged - mean)/std
+
+    #A NaN only leaves unscored the categories that weight its metric, not every category in the pass
+    missing = np.isnan(z_scores)
+    weighted_avg = np.nan_to_num(z_scores) @ weights
+    weighted_avg[(missing.astype(np.float64) @ (weights != 0)) > 0] = np.nan
+    low = np.nanmin(weighted_avg, axis = 0)
+    spread = np.nanmax(weighted_avg, axis = 0) - low
+    spread[spread == 0] = 1
+    scores = 100*(weighted_avg - low)/spread
+
+    return z_scores, weighted_avg, scores
+
+
+#Scores a player pool for each requested category.
+#Returns category name -> frame of id columns, Z-scored metrics, Weighted_Avg and Score.
+def score_categories(df_players, category_names = tuple(categories)):
+    category_names = list(category_names)
+    columns, weights = weight_matrix(category_names)
+    raw_mask = np.isin(columns, raw_vars)
+
+    z_scores, weighted_avg, scores = score_matrix(df_players[columns].to_numpy(dtype = np.float64), raw_mask, weights)
+    position = {var: i for i, var in enumerate(columns)}
+    ids = df_players[id_vars].reset_index(drop = True)
+
+    score_dfs = {}
+    for j, name in enumerate(category_names):
+        cat_vars = categories[name]["vars"]
+        metrics = pd.DataFrame(z_scores[:, [position[var] for var in cat_vars]], columns = cat_vars)
+        score_df = pd.concat([ids, metrics], axis = 1)
+        score_df["Weighted_Avg"] = weighted_avg[:, j]
+        score_df["Score"] = scores[:, j]
+        score_dfs[name] = score_df
+
+    return score_dfs
+
+
+#Score pool key for a comparison: the distinct positions of the players being compared
+def position_groups(positions):
+    return tuple(sorted(set(positions)))
+
+
+#Players whose position starts with any of the given position groups
+def position_pool(df_clean, position_groups):
+    return df_clean[df_clean["Pos"].str.startswith(tuple(position_groups))]
+
+
+#Score tables and radar axis bounds for every requested category over a position pool
+def score_pool(df_clean, position_groups, category_names = tuple(categories)):
+    with span("position_pool"):
+        df_players = position_pool(df_clean, position_groups)
+    with span("standardise"):
+        score_dfs = score_categories(df_players, category_names)
+
+    #Every category table shares the pool's row order, so one (Player, Season, Squad) index serves all
+    rows = row_index(df_players)
+
+    pool_scores = {}
+    for name, score_df in score_dfs.items():
+        metrics = score_df[categories[name]["vars"]]
+        pool_scores[name] = {"df": score_df, "rows": rows, "lower_bounds": metrics.min().tolist(), "upper_bounds": metrics.max().tolist()}
+
+    return pool_scores
+
+
+#Positions of the k largest values after skipping the first `offset`, largest first. Only the
+#offset + k best are selected (np.argpartition) and sorted, never the whole array. Ties go to the
+#earlier position, so consecutive pages never repeat or skip a tied player.
+def top_k(values, k, offset = 0):
+    values = np.asarray(values, dtype = np.float64)
+    n = min(offset + k, len(values))
+    if n <= offset:
+        return np.array([], dtype = np.intp)
+    threshold = values[np.argpartition(-values, n - 1)[n - 1]]
+    best = np.flatnonzero(values >= threshold)
+    best = best[np.lexsort((best, -values[best]))]
+    return best[offset:n]
+
+
+#One page of the highest scores in a category score table, optionally within a league and/or season.
+#Returns the page with each player's rank and the number of player-seasons that qualified.
+def leaderboard(category_scores, k, page = 0, comp = None, season = None):
+    score_df = category_scores["df"]
+    scores = score_df["Score"].to_numpy(dtype = np.float64)
+
+    keep = ~np.isnan(scores)
+    if comp is not None:
+        keep &= (score_df["Comp"] == comp).to_numpy()
+    if season is not None:
+        keep &= (score_df["Season"] == season).to_numpy()
+    candidates = np.flatnonzero(keep)
+
+    rows = candidates[top_k(scores[candidates], k, offset = page*k)]
+    board = score_df.iloc[rows][id_vars + ["Score"]].reset_index(drop = True)
+    board.insert(0, "Rank", np.arange(page*k + 1, page*k + 1 + len(rows)))
+    return board, len(candidates)
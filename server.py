@@ -0,0 +1,221 @@
+#Stateless HTTP radar endpoint, for embedding radars in other tools without a Streamlit session.
+#Reuses the app's feature store, scoring, templates and badges. Every response carries an ETag built
+#from the request and the data version, so browsers and proxies can revalidate with If-None-Match
+#and get a 304 without anything being scored or drawn.
+#Request threads look players up and score; drawing holds the GIL for hundreds of milliseconds, so it
+#is handed to a pool of render processes, each with its own templates.
+#
+#    GET /radar.png?player1=...&season1=23/24&squad1=Arsenal&player2=...&season2=...&squad2=...&category=Creating
+#    GET /radar.svg?...  the same comparison as SVG
+#    GET /health         data version and cache stats
+#
+#    python server.py --port 8502 --workers 4
+#    curl -i "http://localhost:8502/radar.png?player1=...&category=Defense" -o radar.png
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import matplotlib
+matplotlib.use("Agg")
+
+from badges import BadgeAtlas
+from cache import LRUCache
+from features import FeatureStoreWatcher
+from lookup import PlayerIndex
+from render import RENDER_DPI, comparison_args, render_png, render_svg
+from scoring import categories, job_columns, position_groups, score_pool
+
+content_types = {"png": "image/png", "svg": "image/svg+xml"}
+
+#Responses are tied to a data version through the ETag, so they can be reused for a while and
+#revalidated cheaply after that
+CACHE_CONTROL = "public, max-age=300"
+
+logger = logging.getLogger("radars.server")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+#Everything a request needs, shared by the worker threads
+class RadarService:
+    def __init__(self, watcher = None, render_workers = 4):
+        self.watcher = watcher if watcher is not None else FeatureStoreWatcher().start()
+        #Spawned rather than forked, since the server process is full of threads
+        self.renderer = ProcessPoolExecutor(max_workers = render_workers, mp_context = multiprocessing.get_context("spawn"), initializer = init_render_process)
+        self.badge_atlas = BadgeAtlas().load_all()
+        self.score_cache = LRUCache(max_entries = 64, max_bytes = 512 * 2**20)
+        self.render_cache = LRUCache(max_entries = 512, max_bytes = 256 * 2**20)
+        self.player_indexes = {}
+        self._lock = threading.Lock()
+
+    #Only the index for the newest data version is kept
+    def player_index(self, data_version, df_clean):
+        with self._lock:
+            if data_version not in self.player_indexes:
+                self.player_indexes = {data_version: PlayerIndex(df_clean)}
+            return self.player_indexes[data_version]
+
+    #The two (player, season, squad) keys and the category name from a query string
+    def parse_query(self, query):
+        params = {name: values[0] for name, values in parse_qs(query).items()}
+        missing = [column for column in job_columns if not params.get(column)]
+        if missing:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"missing {', '.join(missing)}")
+
+        category_name = params.get("category", "Creating")
+        if category_name not in categories:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"unknown category {category_name!r}, expected one of {', '.join(categories)}")
+
+        keys = [(params["player1"], params["season1"], params["squad1"]), (params["player2"], params["season2"], params["squad2"])]
+        return keys, category_name
+
+    #Same inputs and data version, same tag, in every process
+    def etag(self, data_version, keys, category_name, fmt):
+        payload = json.dumps([data_version, keys, category_name, fmt, RENDER_DPI])
+        return '"' + hashlib.sha256(payload.encode()).hexdigest()[:32] + '"'
+
+    #Feature store rows of the two players, or a 404 if either is missing
+    def player_rows(self, data_version, df_clean, keys):
+        player_index = self.player_index(data_version, df_clean)
+        for key in keys:
+            if key not in player_index:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"no player-season {list(key)} in the feature store")
+        return [player_index.row(*key) for key in keys]
+
+    def render(self, data_version, df_clean, keys, rows, category_name, fmt):
+        category = categories[category_name]
+        pool_groups = position_groups([row["Pos"] for row in rows])
+        category_key = (pool_groups, data_version, category_name)
+        category_scores = self.score_cache.get_or_compute(category_key, lambda: score_pool(df_clean, pool_groups, [category_name])[category_name])
+
+        radar_args = comparison_args(category_scores, category, rows, keys, self.badge_atlas)
+        return self.renderer.submit(draw, fmt, category, radar_args).result()
+
+    #(status, headers, body) for a radar request
+    def radar(self, fmt, query, if_none_match):
+        keys, category_name = self.parse_query(query)
+        data_version, df_clean = self.watcher.current()
+        rows = self.player_rows(data_version, df_clean, keys)
+        etag = self.etag(data_version, keys, category_name, fmt)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+        #Only checked once the request is known to be valid, so a bad one is never a 304
+        if if_none_match is not None and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return HTTPStatus.NOT_MODIFIED, headers, b""
+
+        body = self.render_cache.get_or_compute(etag, lambda: self.render(data_version, df_clean, keys, rows, category_name, fmt))
+        return HTTPStatus.OK, {**headers, "Content-Type": content_types[fmt]}, body
+
+    def health(self):
+        data_version, df_clean = self.watcher.current()
+        return {
+            "data_version": data_version,
+            "rows": len(df_clean),
+            "score_cache": self.score_cache.stats(),
+            "render_cache": self.render_cache.stats(),
+        }
+
+    def close(self):
+        self.renderer.shutdown(wait = True)
+
+
+def init_render_process():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def draw(fmt, category, radar_args):
+    return render_svg(category, *radar_args) if fmt == "svg" else render_png(category, *radar_args)
+
+
+class RadarHandler(BaseHTTPRequestHandler):
+    server_version = "RadarServer/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path in ("/radar.png", "/radar.svg"):
+                fmt = url.path.rsplit(".", 1)[1]
+                status, headers, body = self.server.service.radar(fmt, url.query, self.headers.get("If-None-Match"))
+                self.respond(status, headers, body)
+            elif url.path == "/health":
+                self.respond_json(HTTPStatus.OK, self.server.service.health())
+            else:
+                self.respond_json(HTTPStatus.NOT_FOUND, {"error": f"no such endpoint {url.path}"})
+        except RequestError as e:
+            self.respond_json(e.status, {"error": str(e)})
+        except Exception:
+            logger.exception("Failed to serve %s", self.path)
+            self.respond_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"})
+
+    def respond(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                #The client went away before reading the response
+                pass
+
+    def respond_json(self, status, value):
+        self.respond(status, {"Content-Type": "application/json"}, json.dumps(value).encode())
+
+
+#HTTPServer that hands connections to a fixed pool of worker threads instead of a thread per
+#connection, so a burst of requests queues rather than piling up renders. Connections are closed
+#after each response (HTTP/1.0), so an idle client never holds a worker.
+class PooledHTTPServer(HTTPServer):
+    def __init__(self, address, service, workers = 4):
+        super().__init__(address, RadarHandler)
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "radar-http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait = True)
+        self.service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve radar comparisons over HTTP.")
+    parser.add_argument("--host", default = "127.0.0.1", help = "address to bind")
+    parser.add_argument("--port", type = int, default = 8502, help = "port to listen on")
+    parser.add_argument("--workers", type = int, default = 4, help = "request worker threads")
+    parser.add_argument("--render-workers", type = int, default = 4, help = "processes drawing radars")
+    args = parser.parse_args()
+
+    server = PooledHTTPServer((args.host, args.port), RadarService(render_workers = args.render_workers), workers = args.workers)
+    print(f"Serving radars on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,30 @@
+#Nearest-neighbour search over a position pool's category Z-score vectors
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from scoring import id_vars
+
+
+class SimilarityIndex:
+    #category_scores is a score_pool entry. With weighted=True each axis is scaled by the square
+    #root of its category weight, so Euclidean distance becomes the weight-averaged squared gap.
+    def __init__(self, category_scores, category, weighted = True):
+        score_df = category_scores["df"]
+        scale = np.sqrt(np.abs(category["weights"])) if weighted else np.ones(len(category["vars"]))
+
+        #Missing metrics sit at the pool average (a Z-score of 0)
+        self.points = np.nan_to_num(score_df[category["vars"]].to_numpy(dtype = np.float64))*scale
+        self.tree = KDTree(self.points)
+        self.ids = score_df[id_vars + ["Score"]].reset_index(drop = True)
+        self.rows = category_scores["rows"]
+
+    #The k player-seasons closest to a (Player, Season, Squad) key, nearest first
+    def query(self, key, k = 10):
+        row = self.rows[key]
+        distances, positions = self.tree.query(self.points[row:row + 1], k = min(k + 1, len(self.points)))
+        distances, positions = distances[0], positions[0]
+
+        keep = positions != row
+        similar = self.ids.iloc[positions[keep][:k]].reset_index(drop = True)
+        similar["Distance"] = distances[keep][:k]
+        return similar
@@ -0,0 +1,100 @@
+#Squad job lists, league-position benchmarks and resumable runs, on a small synthetic feature store
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from badges import BadgeAtlas
+from batch import BENCHMARK, benchmark_jobs, output_path, run_batch, squad_pair_jobs
+from features import build_feature_store, clean_player_data, load_feature_store, read_player_csv, read_team_csv
+from lookup import PlayerIndex
+from render import benchmark_args
+from scoring import categories, position_groups, score_pool
+from synthetic_data import write_synthetic_csvs
+
+
+@pytest.fixture(scope = "module")
+def df_clean(tmp_path_factory):
+    player_csv, team_csv = write_synthetic_csvs(str(tmp_path_factory.mktemp("data")), 1500)
+    return clean_player_data(read_player_csv(player_csv), read_team_csv(team_csv))
+
+
+def first_squad_season(player_index):
+    squad = player_index.squad_options()[0]
+    return squad, player_index.season_options(squad)[0]
+
+
+def test_squad_pairs_are_drawn_once_unless_ordered(df_clean):
+    player_index = PlayerIndex(df_clean)
+    squad, season = first_squad_season(player_index)
+    n = len(player_index.player_options(squad, season))
+
+    pairs = squad_pair_jobs(player_index, squad, season, "Creating")
+    assert len(pairs) == n*(n - 1)//2
+    assert len({frozenset((job["player1"], job["player2"])) for job in pairs}) == len(pairs)
+    assert len(squad_pair_jobs(player_index, squad, season, "Creating", ordered = True)) == n*(n - 1)
+    assert len(squad_pair_jobs(player_index, squad, season)) == len(pairs)*len(categories)
+
+
+def test_benchmark_is_the_league_position_average(df_clean):
+    player_index = PlayerIndex(df_clean)
+    squad, season = first_squad_season(player_index)
+    jobs = benchmark_jobs(player_index, squad, season, "Defense")
+    assert len(jobs) == len(player_index.player_options(squad, season))
+
+    job = jobs[0]
+    key = (job["player1"], job["season1"], job["squad1"])
+    row = player_index.row(*key)
+    assert job["player2"] == BENCHMARK and job["squad2"] == row["Comp"]
+
+    category = categories["Defense"]
+    category_scores = score_pool(df_clean, position_groups([row["Pos"]]), ["Defense"])["Defense"]
+    _, _, players, values, scores, _, _ = benchmark_args(category_scores, category, row, key, job["squad2"], job["season2"], BadgeAtlas())
+
+    score_df = category_scores["df"]
+    peers = score_df[((score_df["Comp"] == row["Comp"]) & (score_df["Season"] == season)).to_numpy()]
+    assert players == [row["Player"].upper(), f"{row['Comp'].upper()} AVERAGE"]
+    assert np.allclose(values[1], peers[category["vars"]].mean())
+    assert scores[1] == pytest.approx(peers["Score"].mean())
+
+
+def progress_records(out_dir):
+    with open(os.path.join(out_dir, "progress.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_run_batch_resumes_until_the_data_changes(tmp_path):
+    player_csv, team_csv = write_synthetic_csvs(str(tmp_path / "data"), 1500)
+    store_dir = str(tmp_path / "store")
+    old_version, _ = build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    player_index = PlayerIndex(load_feature_store(store_dir)[1])
+    squad, season = first_squad_season(player_index)
+    jobs = squad_pair_jobs(player_index, squad, season, "Creating")[:2]
+    out_dir = str(tmp_path / "out")
+
+    assert run_batch(jobs, out_dir, workers = 1, store_dir = store_dir) == 0
+    paths = [output_path(out_dir, job) for job in jobs]
+    assert all(os.path.exists(path) for path in paths)
+    assert [record["data_version"] for record in progress_records(out_dir)] == [old_version]*2
+
+    #Nothing is redrawn for the same data
+    mtimes = [os.stat(path).st_mtime_ns for path in paths]
+    assert run_batch(jobs, out_dir, workers = 1, store_dir = store_dir) == 0
+    assert len(progress_records(out_dir)) == 2
+    assert [os.stat(path).st_mtime_ns for path in paths] == mtimes
+
+    #New possession figures change every partition, so both radars are redone
+    team_df = pd.read_csv(team_csv)
+    team_df.loc[team_df["Team_or_Opponent"] == "team", "Poss"] += 1
+    edited_team_csv = str(tmp_path / "teams_edited.csv")
+    team_df.to_csv(edited_team_csv, index = False)
+    new_version, _ = build_feature_store(team_csv = edited_team_csv, store_dir = store_dir)
+    assert new_version != old_version
+
+    assert run_batch(jobs, out_dir, workers = 1, store_dir = store_dir) == 0
+    records = progress_records(out_dir)
+    assert len(records) == 4
+    assert sorted(record["path"] for record in records[2:]) == sorted(paths)
+    assert all(record["status"] == "ok" and record["data_version"] == new_version for record in records[2:])
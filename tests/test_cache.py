@@ -0,0 +1,70 @@
+#Eviction, accounting and get_or_compute of the shared LRU cache
+import threading
+
+from cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_entries():
+    cache = LRUCache(max_entries = 2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_bytes():
+    cache = LRUCache(max_entries = 10, max_bytes = 100)
+    cache.put("a", b"x"*40)
+    cache.put("b", b"x"*40)
+    cache.put("c", b"x"*40)
+    assert "a" not in cache and len(cache) == 2 and cache.bytes == 80
+
+    #Replacing a key swaps its size rather than adding to it
+    cache.put("b", b"x"*10)
+    assert cache.bytes == 50
+
+    #A value over the whole budget is returned but not kept, and evicts nothing
+    assert cache.put("big", b"x"*200) == b"x"*200
+    assert "big" not in cache and len(cache) == 2 and cache.bytes == 50
+
+
+def test_hit_and_miss_accounting():
+    cache = LRUCache()
+    calls = []
+    compute = lambda: calls.append(1) or "value"
+
+    assert cache.get_or_compute("k", compute) == "value"
+    assert cache.get_or_compute("k", compute) == "value"
+    assert cache.get("missing") is None
+    assert len(calls) == 1
+    assert cache.stats() == {"entries": 1, "bytes": cache.bytes, "hits": 1, "misses": 2, "evictions": 0}
+
+
+def test_computes_outside_the_lock():
+    cache = LRUCache()
+    cache.put("other", 1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_compute():
+        started.set()
+        release.wait(5)
+        return 2
+
+    worker = threading.Thread(target = lambda: cache.get_or_compute("slow", slow_compute))
+    worker.start()
+    assert started.wait(5)
+
+    #Other keys are served while the miss is still being computed
+    result = []
+    reader = threading.Thread(target = lambda: result.append(cache.get("other")))
+    reader.start()
+    reader.join(5)
+    assert result == [1]
+
+    release.set()
+    worker.join(5)
+    assert cache.get("slow") == 2
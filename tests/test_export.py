@@ -0,0 +1,67 @@
+#Background full resolution exports: only encoded on request, shared between sessions, and a
+#session's stale queued export is dropped when it moves on
+import threading
+
+import render
+from cache import LRUCache
+from render import ExportQueue
+
+
+def test_stale_exports_are_superseded(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    drawn = []
+
+    def fake_render(category, *radar_args, dpi, template_set):
+        drawn.append(category)
+        started.set()
+        release.wait(5)
+        return category.encode()
+
+    monkeypatch.setattr(render, "render_png", fake_render)
+    queue = ExportQueue(LRUCache())
+    owner, other = object(), object()
+
+    #The single worker is busy with "a", so "b" queues behind it
+    queue.submit(owner, "a", "a", ())
+    assert started.wait(5)
+    queue.submit(owner, "b", "b", ())
+    assert queue.pending("b")
+
+    #Moving on drops the queued "b"; the running "a" is left to finish
+    queue.supersede(owner, "c")
+    assert not queue.pending("b") and queue.pending("a")
+
+    #A job another session is waiting on is shared, not dropped
+    queue.submit(owner, "d", "d", ())
+    queue.submit(other, "d", "d", ())
+    queue.supersede(owner, "e")
+    assert queue.pending("d")
+
+    release.set()
+    queue.executor.shutdown(wait = True)
+    assert drawn == ["a", "d"]
+    assert queue.get("a") == b"a" and queue.get("d") == b"d" and queue.get("b") is None
+    assert not queue.owners
+
+
+def test_failed_export_is_reported_and_retried(monkeypatch):
+    attempts = []
+
+    def flaky_render(category, *radar_args, dpi, template_set):
+        attempts.append(category)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return b"png"
+
+    monkeypatch.setattr(render, "render_png", flaky_render)
+    queue = ExportQueue(LRUCache())
+    owner = object()
+
+    queue.submit(owner, "a", "a", ())
+    queue.jobs["a"].exception(5)
+    assert queue.failed("a") and not queue.pending("a")
+
+    queue.submit(owner, "a", "a", ())
+    queue.executor.shutdown(wait = True)
+    assert queue.get("a") == b"png" and not queue.failed("a")
@@ -0,0 +1,134 @@
+#Ingest, replace and reload of the partitioned feature store, on small synthetic CSVs
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import features
+from features import FeatureStoreWatcher, build_feature_store, clean_player_data, load_feature_store, read_manifest, read_partitions, read_player_csv, read_team_csv
+from synthetic_data import write_synthetic_csvs
+
+
+@pytest.fixture
+def sources(tmp_path):
+    player_csv, team_csv = write_synthetic_csvs(str(tmp_path / "data"), 1500)
+    return player_csv, team_csv, str(tmp_path / "store")
+
+
+#Copy of the player CSV with one field of the first qualifying row in a league changed as text,
+#leaving every other line byte for byte the same
+def edit_player_csv(player_csv, out_path, comp, column = "KP", delta = 5):
+    with open(player_csv, newline = "") as f:
+        rows = list(csv.reader(f))
+    header = {name: i for i, name in enumerate(rows[0])}
+    for row in rows[1:]:
+        if row[header["Comp"]] == comp and float(row[header["Min_Playing"]]) >= 900:
+            row[header[column]] = str(float(row[header[column]]) + delta)
+            break
+    with open(out_path, "w", newline = "") as f:
+        csv.writer(f).writerows(rows)
+    return out_path
+
+
+def partition_key_for(df, comp):
+    return f"{int(df['Season_End_Year'].iloc[0])}|{comp}"
+
+
+def assert_same_rows(df, expected):
+    keys = ["Player", "Season", "Squad"]
+    df = df.sort_values(keys).reset_index(drop = True)
+    expected = expected[df.columns].sort_values(keys).reset_index(drop = True)
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            assert np.allclose(df[column], expected[column], equal_nan = True), column
+        else:
+            assert (df[column].astype(str) == expected[column].astype(str)).all(), column
+
+
+def test_ingest_rebuilds_only_changed_partitions(sources, tmp_path):
+    player_csv, team_csv, store_dir = sources
+    version, changed = build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    assert len(changed) == 5
+
+    assert build_feature_store(store_dir = store_dir) == (version, [])
+
+    edited = edit_player_csv(player_csv, str(tmp_path / "edited.csv"), "Serie A")
+    new_version, changed = build_feature_store(player_csv = edited, store_dir = store_dir)
+    assert new_version != version
+    assert changed == [partition_key_for(read_player_csv(edited), "Serie A")]
+
+    loaded_version, df_clean = load_feature_store(store_dir)
+    assert loaded_version == new_version
+    assert_same_rows(df_clean, clean_player_data(read_player_csv(edited), read_team_csv(team_csv)))
+
+
+def test_replaced_partitions_outlive_the_swap(sources, tmp_path):
+    player_csv, team_csv, store_dir = sources
+    build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    old_manifest = read_manifest(store_dir)
+
+    first_edit = edit_player_csv(player_csv, str(tmp_path / "first.csv"), "Serie A")
+    build_feature_store(player_csv = first_edit, store_dir = store_dir, grace_seconds = 0)
+    replaced = [part["path"] for key, part in old_manifest["partitions"].items() if "Serie A" in key]
+
+    #A reader still holding the previous manifest can load it right after the swap
+    assert all(os.path.exists(path) for path in replaced)
+    assert set(replaced) <= set(read_manifest(store_dir)["retired"])
+    assert len(read_partitions(old_manifest)) == len(clean_player_data(read_player_csv(player_csv), read_team_csv(team_csv)))
+
+    #and the files go at the first ingest after the grace period
+    second_edit = edit_player_csv(first_edit, str(tmp_path / "second.csv"), "La Liga")
+    build_feature_store(player_csv = second_edit, store_dir = store_dir, grace_seconds = 0)
+    assert not any(os.path.exists(path) for path in replaced)
+    assert not set(replaced) & set(read_manifest(store_dir)["retired"])
+
+
+def test_readers_keep_an_ingest_of_other_files(sources, tmp_path):
+    player_csv, team_csv, store_dir = sources
+    build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    edited = edit_player_csv(player_csv, str(tmp_path / "edited.csv"), "Bundesliga")
+    version, _ = build_feature_store(player_csv = edited, store_dir = store_dir)
+
+    assert load_feature_store(store_dir)[0] == version
+    assert read_manifest(store_dir)["version"] == version
+
+
+def test_watcher_retries_a_failed_reload(sources, tmp_path, monkeypatch):
+    player_csv, team_csv, store_dir = sources
+    old_version, _ = build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    watcher = FeatureStoreWatcher(store_dir = store_dir)
+    assert watcher.current()[0] == old_version
+
+    edited = edit_player_csv(player_csv, str(tmp_path / "edited.csv"), "Ligue 1")
+    new_version, _ = build_feature_store(player_csv = edited, store_dir = store_dir)
+
+    def failing_read(manifest):
+        raise OSError("partition unavailable")
+
+    monkeypatch.setattr(features, "read_partitions", failing_read)
+    with pytest.raises(OSError):
+        watcher.poll()
+    assert watcher.current()[0] == old_version
+
+    monkeypatch.undo()
+    assert watcher.poll()
+    assert watcher.current()[0] == new_version
+
+
+def test_readers_leave_ingesting_to_features_py(sources, tmp_path):
+    player_csv, team_csv, store_dir = sources
+    old_version, _ = build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+    watcher = FeatureStoreWatcher(store_dir = store_dir)
+
+    #A CSV edited (or still being written) in place is not ingested by readers
+    edit_player_csv(player_csv, player_csv, "Serie A")
+    assert not watcher.poll()
+    assert load_feature_store(store_dir)[0] == old_version
+    assert read_manifest(store_dir)["version"] == old_version
+
+    new_version, _ = build_feature_store(store_dir = store_dir)
+    assert new_version != old_version
+    assert watcher.poll()
+    assert watcher.current()[0] == new_version
@@ -0,0 +1,35 @@
+#Percentile ranks within a position group and season
+import numpy as np
+import pandas as pd
+import pytest
+
+from percentiles import PercentileIndex
+
+
+@pytest.fixture
+def index():
+    df = pd.DataFrame({
+        "Pos": ["FW", "FW", "FW", "FW", "FW,MF", "MF"],
+        "Season": ["23/24"]*6,
+        "npxG_Expected": [0.1, 0.2, 0.3, 0.4, 0.5, 9.0],
+        "Dist_Standard": [10.0, 12.0, 14.0, 16.0, 18.0, 30.0],
+    })
+    return PercentileIndex(df, metrics = ["npxG_Expected", "Dist_Standard"])
+
+
+def test_higher_is_better(index):
+    #FW pools every position starting with FW, so the MF row is left out
+    assert index.percentile("FW", "23/24", "npxG_Expected", 0.5) == 100
+    assert index.percentile("FW", "23/24", "npxG_Expected", 0.1) == 20
+    assert index.percentile("FW", "23/24", "npxG_Expected", 0.35) == 60
+
+
+def test_lower_is_better_metrics_are_ranked_the_other_way(index):
+    assert index.percentile("FW", "23/24", "Dist_Standard", 10.0) == 100
+    assert index.percentile("FW", "23/24", "Dist_Standard", 18.0) == 20
+    assert index.percentile("FW", "23/24", "Dist_Standard", 15.0) == 40
+
+
+def test_missing_pool_or_value(index):
+    assert np.isnan(index.percentile("GK", "23/24", "Dist_Standard", 10.0))
+    assert np.isnan(index.percentile("FW", "23/24", "Dist_Standard", np.nan))
@@ -0,0 +1,105 @@
+#Vectorized scoring against the per column scikit-learn pipeline it replaced, and leaderboard paging
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from scoring import leaderboard, score_matrix, top_k
+
+
+#Per column log transform and StandardScaler, then weighted averages rescaled with MinMaxScaler,
+#as the app scored each category before the fused pass
+def sklearn_scores(values, raw_mask, weights):
+    z_scores = np.empty_like(values)
+    for j in range(values.shape[1]):
+        column = values[:, j] if raw_mask[j] else np.log(values[:, j] + 0.1)
+        z_scores[:, j] = StandardScaler().fit_transform(column.reshape(-1, 1)).ravel()
+
+    weighted_avg = z_scores @ weights
+    scores = np.column_stack([MinMaxScaler(feature_range = (0, 100)).fit_transform(weighted_avg[:, [j]]).ravel() for j in range(weights.shape[1])])
+    return z_scores, weighted_avg, scores
+
+
+def test_score_matrix_matches_sklearn():
+    rng = np.random.default_rng(0)
+    values = rng.gamma(2.0, 1.5, size = (40, 5))
+    values[:, 2] = 3.0
+    values[:, 4] = rng.normal(0, 1, size = 40)
+    values[7] = np.nan
+    values[19, 1] = np.nan
+    raw_mask = np.array([False, False, False, False, True])
+    weights = rng.uniform(-0.2, 0.3, size = (5, 2))
+
+    for result, expected in zip(score_matrix(values, raw_mask, weights), sklearn_scores(values, raw_mask, weights)):
+        assert np.allclose(result, expected, equal_nan = True)
+
+    #The constant column Z-scores to zero rather than NaN, and NaN rows stay unscored
+    z_scores, _, scores = score_matrix(values, raw_mask, weights)
+    assert np.all(z_scores[~np.isnan(z_scores[:, 2]), 2] == 0)
+    assert np.isnan(scores[7]).all() and np.isnan(scores[19]).all()
+    assert np.allclose(np.nanmin(scores, axis = 0), 0) and np.allclose(np.nanmax(scores, axis = 0), 100)
+
+
+def test_nan_metric_only_unscores_its_own_categories():
+    rng = np.random.default_rng(3)
+    values = rng.gamma(2.0, 1.5, size = (30, 4))
+    values[4, 1] = np.nan
+    raw_mask = np.zeros(4, dtype = bool)
+    #Column 1 is only weighted by the first category
+    weights = np.array([[0.5, 0.0], [0.5, 0.0], [0.0, 0.6], [0.0, 0.4]])
+
+    z_scores, weighted_avg, scores = score_matrix(values, raw_mask, weights)
+    assert np.isnan(scores[4, 0]) and np.isfinite(scores[4, 1])
+
+    #and the second category scores as it would on its own
+    _, _, alone = score_matrix(values[:, 2:], raw_mask[2:], weights[2:, 1:])
+    assert np.allclose(scores[:, 1], alone[:, 0])
+
+
+def score_table(scores, comps, seasons):
+    n = len(scores)
+    df = pd.DataFrame({"Season": seasons, "Squad": [f"Club {i}" for i in range(n)], "Comp": comps, "Player": [f"Player {i}" for i in range(n)], "Score": scores})
+    return {"df": df}
+
+
+def test_top_k_breaks_ties_by_position():
+    values = np.array([5.0, 9.0, 5.0, 7.0, 5.0, 5.0, 1.0])
+    assert top_k(values, 3).tolist() == [1, 3, 0]
+    assert top_k(values, 3, offset = 3).tolist() == [2, 4, 5]
+    assert np.concatenate([top_k(values, 2, offset = offset) for offset in range(0, 8, 2)]).tolist() == [1, 3, 0, 2, 4, 5, 6]
+
+    #Large runs of ties, where np.argpartition returns them in no particular order
+    values = np.repeat(np.random.default_rng(2).permutation(np.arange(20.0)), 50)
+    pages = np.concatenate([top_k(values, 25, offset = offset) for offset in range(0, len(values), 25)])
+    assert pages.tolist() == np.lexsort((np.arange(len(values)), -values)).tolist()
+
+
+def test_top_k_beyond_the_pool():
+    values = np.array([2.0, 3.0, 1.0])
+    assert top_k(values, 10).tolist() == [1, 0, 2]
+    assert top_k(values, 2, offset = 2).tolist() == [2]
+    assert top_k(values, 2, offset = 4).tolist() == []
+    assert top_k(np.array([]), 5).tolist() == []
+
+
+def test_leaderboard_pages_and_filters():
+    rng = np.random.default_rng(1)
+    n = 23
+    scores = rng.uniform(0, 100, n)
+    scores[5] = np.nan
+    comps = np.where(np.arange(n) % 2 == 0, "Serie A", "La Liga")
+    seasons = np.where(np.arange(n) % 3 == 0, "22/23", "23/24")
+    category_scores = score_table(scores, comps, seasons)
+
+    order = [i for i in np.argsort(-scores, kind = "stable") if not np.isnan(scores[i])]
+    pages = [leaderboard(category_scores, 5, page = page) for page in range(5)]
+    assert all(qualified == n - 1 for _, qualified in pages)
+    assert [len(board) for board, _ in pages] == [5, 5, 5, 5, 2]
+    assert pd.concat([board for board, _ in pages])["Player"].tolist() == [f"Player {i}" for i in order]
+    assert pages[4][0]["Rank"].tolist() == [21, 22]
+    assert len(leaderboard(category_scores, 5, page = 5)[0]) == 0
+
+    board, qualified = leaderboard(category_scores, 50, comp = "Serie A", season = "22/23")
+    expected = [i for i in order if comps[i] == "Serie A" and seasons[i] == "22/23"]
+    assert qualified == len(expected)
+    assert board["Player"].tolist() == [f"Player {i}" for i in expected]
+    assert board["Rank"].tolist() == list(range(1, len(expected) + 1))
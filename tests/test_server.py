@@ -0,0 +1,100 @@
+#The HTTP endpoint end to end: a PooledHTTPServer on a free port over a small synthetic feature store
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import pytest
+
+from features import FeatureStoreWatcher, build_feature_store
+from lookup import PlayerIndex
+from server import PooledHTTPServer, RadarService
+from synthetic_data import write_synthetic_csvs
+
+
+@pytest.fixture(scope = "module")
+def server(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("data")
+    player_csv, team_csv = write_synthetic_csvs(str(data_dir), 1500)
+    store_dir = str(data_dir / "store")
+    build_feature_store(player_csv = player_csv, team_csv = team_csv, store_dir = store_dir)
+
+    service = RadarService(watcher = FeatureStoreWatcher(store_dir = store_dir), render_workers = 1)
+    httpd = PooledHTTPServer(("127.0.0.1", 0), service, workers = 2)
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+@pytest.fixture(scope = "module")
+def comparison(server):
+    _, df_clean = server.service.watcher.current()
+    player_index = PlayerIndex(df_clean)
+    squad = player_index.squad_options()[0]
+    season = player_index.season_options(squad)[0]
+    player1, player2 = player_index.player_options(squad, season)[:2]
+    return {"player1": player1, "season1": season, "squad1": squad, "player2": player2, "season2": season, "squad2": squad, "category": "Defense"}
+
+
+#(status, headers, body), with error statuses returned rather than raised
+def get(server, path, params = None, headers = None):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    if params is not None:
+        url += "?" + urlencode(params)
+    try:
+        with urlopen(Request(url, headers = headers or {}), timeout = 60) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as e:
+        with e:
+            return e.code, e.headers, e.read()
+
+
+def test_radar_formats_and_etags(server, comparison):
+    status, headers, png = get(server, "/radar.png", comparison)
+    assert status == 200 and headers["Content-Type"] == "image/png"
+    assert png.startswith(b"\x89PNG")
+
+    status, svg_headers, svg = get(server, "/radar.svg", comparison)
+    assert status == 200 and svg_headers["Content-Type"] == "image/svg+xml"
+    assert b"<svg" in svg
+    assert svg_headers["ETag"] != headers["ETag"]
+
+    #Same request, same tag and bytes
+    status, again, body = get(server, "/radar.png", comparison)
+    assert status == 200 and again["ETag"] == headers["ETag"] and body == png
+
+    status, not_modified, body = get(server, "/radar.png", comparison, {"If-None-Match": headers["ETag"]})
+    assert status == 304 and body == b"" and not_modified["ETag"] == headers["ETag"]
+
+    status, _, body = get(server, "/radar.png", comparison, {"If-None-Match": '"stale"'})
+    assert status == 200 and body == png
+
+
+def test_bad_requests(server, comparison):
+    status, headers, body = get(server, "/radar.png", {**comparison, "category": "Juggling"})
+    assert status == 400 and headers["Content-Type"] == "application/json"
+    assert "Juggling" in json.loads(body)["error"]
+
+    status, _, body = get(server, "/radar.png", {name: value for name, value in comparison.items() if name != "squad2"})
+    assert status == 400 and "squad2" in json.loads(body)["error"]
+
+    #A matching tag never turns an unknown player into a 304
+    _, headers, _ = get(server, "/radar.png", comparison)
+    status, _, body = get(server, "/radar.png", {**comparison, "player2": "Nobody"}, {"If-None-Match": headers["ETag"]})
+    assert status == 404 and "error" in json.loads(body)
+
+    status, _, _ = get(server, "/nowhere")
+    assert status == 404
+
+
+def test_health(server):
+    status, headers, body = get(server, "/health")
+    health = json.loads(body)
+    assert status == 200 and headers["Content-Type"] == "application/json"
+    assert health["data_version"] == server.service.watcher.current()[0]
+    assert health["rows"] == len(server.service.watcher.current()[1])
+    assert "hits" in health["render_cache"]